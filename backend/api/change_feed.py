@@ -0,0 +1,79 @@
+"""Поток изменений рецептов в формате NDJSON.
+
+Клиент передаёт since — последнюю известную позицию в журнале
+RecipeChange — и получает по строке на изменённый рецепт:
+    {"change": 42, "action": "updated", "id": 7, "recipe": {...}}
+    {"change": 43, "action": "deleted", "id": 9}
+Последняя строка — {"next_since": 43, "has_more": false}; next_since
+передаётся в следующем запросе. Журнал читается пачками по позиции,
+внутри пачки от рецепта остаётся только последняя запись. Позиции
+выдаются после коммита в порядке коммитов (recipes.changes
+.publish_changes), а записи без позиции не отдаются, поэтому более
+поздняя позиция не может стать видна раньше более ранней.
+"""
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+
+from api.read_serializers import recipe_rows, serialize_recipes
+from api.renderers import FastJSONRenderer
+from recipes.models import Recipe, RecipeChange
+
+CHANGES_BATCH_SIZE = 500
+
+# Бюджет запросов ответа: аутентификация, пустая пачка в конце и по четыре
+# на каждую пачку журнала (журнал, рецепты, теги, ингредиенты). Ответ
+# потоковый, QueryBudgetMixin его не видит, бюджет проверяют тесты
+# и check_query_budgets.
+CHANGES_MAX_QUERIES = 2 + 4 * -(-settings.RECIPE_CHANGES_LIMIT
+                                // CHANGES_BATCH_SIZE)
+
+renderer = FastJSONRenderer()
+
+
+def render_line(data):
+    return renderer.render(data) + b'\n'
+
+
+def change_batches(since, limit):
+    """Пачки записей журнала после позиции since, не больше limit."""
+    sent = 0
+    while sent < limit:
+        batch = list(RecipeChange.objects.filter(
+            position__gt=since,
+        ).order_by('position').values_list(
+            'position', 'recipe_id', 'action'
+        )[:min(CHANGES_BATCH_SIZE, limit - sent)])
+        if not batch:
+            return
+        yield batch
+        sent += len(batch)
+        since = batch[-1][0]
+
+
+def change_lines(since, request):
+    """Строки NDJSON с изменениями после since."""
+    limit = settings.RECIPE_CHANGES_LIMIT
+    sent = 0
+    for batch in change_batches(since, limit):
+        sent += len(batch)
+        since = batch[-1][0]
+        latest = {}
+        for change_id, recipe_id, action in batch:
+            latest.pop(recipe_id, None)
+            latest[recipe_id] = (change_id, action)
+        updated_ids = [recipe_id for recipe_id, (_, action) in latest.items()
+                       if action == RecipeChange.UPDATED]
+        recipes = {
+            item['id']: item for item in serialize_recipes(recipe_rows(
+                Recipe.objects.filter(pk__in=updated_ids), AnonymousUser()
+            ), request)
+        }
+        for recipe_id, (change_id, action) in latest.items():
+            line = {'change': change_id, 'action': action, 'id': recipe_id}
+            if action == RecipeChange.UPDATED:
+                if recipe_id not in recipes:
+                    # Удалён позже, запись об удалении придёт дальше.
+                    continue
+                line['recipe'] = recipes[recipe_id]
+            yield render_line(line)
+    yield render_line({'next_since': since, 'has_more': sent >= limit})
@@ -23,3 +23,7 @@ INGREDIENT_AMOUNT_ERROR = 'Количество ингредиента долж
 INGREDIENT_AMOUNT_FORMAT_ERROR = 'Количество ингредиента должно быть числj'
 COOKING_TIME_ERROR = 'Время приготовления не может быть меньше 1 минуты'
 INVALID_CHARTERS_IN_USRNAME = 'Не правельные символы в username.'
+BULK_IDS_FORMAT_ERROR = 'Ожидается непустой список целочисленных id'
+BULK_IDS_LIMIT_ERROR = 'Слишком много id в одном запросе (максимум {limit})'
+INGREDIENT_SNAPSHOT_NOT_FOUND_ERROR = 'Снимок ингредиентов ещё не опубликован'
+CHANGES_SINCE_ERROR = 'since должен быть неотрицательным целым числом'
@@ -1,48 +1,140 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
 
-from recipes.models import Ingredient, Recipe
+from api.constants import AUTHOR_NOT_FOUND_ERROR
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingList, Tag)
 
 User = get_user_model()
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список чисел через запятую: ?author=1,2."""
+
+
 class RecipeFilter(filters.FilterSet):
-    """Фильтрация по избранному, автору, списку покупок и тегам."""
+    """Фильтрация по избранному, авторам, списку покупок, тегам,
+    времени приготовления и ингредиентам. Условия по связанным таблицам
+    строятся через EXISTS, поэтому рецепты не дублируются и не нужен
+    DISTINCT.
+    """
 
-    author = filters.ModelChoiceFilter(
-        field_name='author',
-        label='Автор',
-        queryset=User.objects.all(),
+    author = NumberInFilter(
+        method='filter_author',
+        label='Авторы',
     )
-
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = filters.ModelMultipleChoiceFilter(
+        queryset=Tag.objects.all(),
+        to_field_name='slug',
+        method='filter_tags',
         label='Тэги',
     )
+    cooking_time = filters.RangeFilter(
+        label='Время приготовления (cooking_time_min, cooking_time_max)',
+    )
+    include_ingredients = NumberInFilter(
+        method='filter_include_ingredients',
+        label='Есть все ингредиенты',
+    )
+    exclude_ingredients = NumberInFilter(
+        method='filter_exclude_ingredients',
+        label='Нет ни одного из ингредиентов',
+    )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited',
         label='Избранные рецепты',)
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart', label='В списке покупок',
     )
+    min_calories = filters.NumberFilter(
+        field_name='nutrition__calories', lookup_expr='gte',
+        label='Калорийность от',
+    )
+    max_calories = filters.NumberFilter(
+        field_name='nutrition__calories', lookup_expr='lte',
+        label='Калорийность до',
+    )
+    max_price = filters.NumberFilter(
+        field_name='nutrition__price', lookup_expr='lte',
+        label='Стоимость до',
+    )
+    ordering = filters.ChoiceFilter(
+        method='filter_ordering',
+        label='Сортировка',
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'Набирающие популярность'),
+            ('calories', 'Менее калорийные'),
+            ('-calories', 'Более калорийные'),
+            ('price', 'Дешевле'),
+            ('-price', 'Дороже'),
+        ),
+    )
 
     class Meta:
         model = Recipe
         fields = ['author',
                   'tags',
+                  'cooking_time',
+                  'include_ingredients',
+                  'exclude_ingredients',
                   'is_favorited',
-                  'is_in_shopping_cart', ]
+                  'is_in_shopping_cart',
+                  'min_calories',
+                  'max_calories',
+                  'max_price',
+                  'ordering', ]
+
+    def filter_author(self, queryset, name, value):
+        """Неизвестный автор — ошибка 400, как и до списка авторов."""
+        authors = {int(author_id) for author_id in value}
+        if User.objects.filter(pk__in=authors).count() != len(authors):
+            raise ValidationError({'author': [AUTHOR_NOT_FOUND_ERROR]})
+        return queryset.filter(author_id__in=authors)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag__in=value)))
+
+    def filter_include_ingredients(self, queryset, name, value):
+        for ingredient_id in {int(ingredient_id) for ingredient_id in value}:
+            queryset = queryset.filter(Exists(IngredientRecipe.objects.filter(
+                recipe_id=OuterRef('pk'), ingredient_id=ingredient_id)))
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        return queryset.exclude(Exists(IngredientRecipe.objects.filter(
+            recipe_id=OuterRef('pk'),
+            ingredient_id__in=[int(ingredient_id) for ingredient_id in value],
+        )))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorite__user=self.request.user)
+            return queryset.filter(Exists(FavoriteRecipe.objects.filter(
+                recipe_id=OuterRef('pk'), user=self.request.user)))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shoppingcart__user=self.request.user)
+            return queryset.filter(Exists(ShoppingList.objects.filter(
+                recipe_id=OuterRef('pk'), user=self.request.user)))
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка по предрассчитанным рейтингу (RecipeScore)
+        или итогам рецепта (RecipeNutrition).
+        """
+        if value in ('popular', 'trending'):
+            return queryset.filter(score__isnull=False).order_by(
+                f'-score__{value}', '-pub_date')
+        prefix = '-' if value.startswith('-') else ''
+        return queryset.filter(nutrition__isnull=False).order_by(
+            f'{prefix}nutrition__{value.lstrip("-")}', '-pub_date')
+
 
 class IngredientFilter(filters.FilterSet):
     """Фильтрация ингредиентов по названию."""
@@ -55,3 +147,20 @@ class IngredientFilter(filters.FilterSet):
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+
+class UserFilter(filters.FilterSet):
+    """Поиск пользователей по началу логина или email."""
+
+    username = filters.CharFilter(
+        field_name='username',
+        lookup_expr='istartswith',
+    )
+    email = filters.CharFilter(
+        field_name='email',
+        lookup_expr='istartswith',
+    )
+
+    class Meta:
+        model = User
+        fields = ('username', 'email')
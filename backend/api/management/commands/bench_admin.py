@@ -0,0 +1,72 @@
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+CHANGELISTS = (
+    'admin:recipes_recipe_changelist',
+    'admin:recipes_ingredient_changelist',
+    'admin:recipes_favoriterecipe_changelist',
+    'admin:users_customuser_changelist',
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Время отрисовки страниц админки, число SQL-запросов '
+            'и размер страницы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='пути страниц, по умолчанию списки '
+                                 'и форма рецепта')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        admin = User.objects.filter(is_superuser=True).first()
+        if admin is None:
+            raise CommandError('Нужен суперпользователь.')
+        paths = options['paths'] or self.default_paths()
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        client = Client(HTTP_HOST=host)
+        client.force_login(admin)
+        for path in paths:
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                response = client.get(path)
+            timings = []
+            for _ in range(options['repeat']):
+                started = perf_counter()
+                client.get(path)
+                timings.append(perf_counter() - started)
+            self.stdout.write(
+                f'{path}: {response.status_code}, '
+                f'{median(timings) * 1000:.0f} мс, '
+                f'{queries.count} запросов, '
+                f'{len(response.content) / 1024:.0f} КБ')
+
+    def default_paths(self):
+        paths = [reverse(name) for name in CHANGELISTS]
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        if recipe_id is not None:
+            paths.append(reverse('admin:recipes_recipe_change',
+                                 args=[recipe_id]))
+        return paths
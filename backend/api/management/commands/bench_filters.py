@@ -0,0 +1,94 @@
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+from recipes.models import IngredientRecipe, Recipe, Tag
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += perf_counter() - started
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = ('Время списка рецептов с фильтрами (теги, авторы, время '
+            'приготовления, ингредиенты) на текущих данных: SQL и ответ '
+            'целиком. Ограничение частоты запросов отключено.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError('Нет рецептов.')
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'list'}, throttle_classes=())
+        self.stdout.write(f'Рецептов: {Recipe.objects.count()}')
+        for params in self.scenarios():
+            sql_times, response_times = [], []
+            for _ in range(options['repeat']):
+                timer = QueryTimer()
+                started = perf_counter()
+                with override_settings(RECIPE_INDEX_ENABLED=False), \
+                        connection.execute_wrapper(timer):
+                    response = view(factory.get('/api/recipes/', params,
+                                                HTTP_HOST=host))
+                    response.render()
+                if response.status_code != 200:
+                    raise CommandError(f'{params}: ответ '
+                                       f'{response.status_code}')
+                response_times.append(perf_counter() - started)
+                sql_times.append(timer.elapsed)
+            self.stdout.write(
+                f'{params}: найдено {response.data["count"]}, '
+                f'{timer.count} запросов, SQL {median(sql_times) * 1000:.2f} '
+                f'мс, ответ {median(response_times) * 1000:.2f} мс')
+
+    def scenarios(self):
+        """Фильтры по самым частым значениям в базе."""
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredients = list(IngredientRecipe.objects.values(
+            'ingredient_id').annotate(uses=Count('id')).order_by(
+                '-uses').values_list('ingredient_id', flat=True)[:3])
+        authors = list(Recipe.objects.values('author_id').annotate(
+            recipes=Count('id')).order_by('-recipes').values_list(
+                'author_id', flat=True)[:3])
+        scenarios = [
+            {},
+            {'cooking_time_max': 30},
+            {'cooking_time_min': 10, 'cooking_time_max': 20},
+            {'author': ','.join(map(str, authors))},
+        ]
+        if tags:
+            scenarios.append({'tags': tags})
+        if ingredients:
+            scenarios += [
+                {'include_ingredients': ingredients[0]},
+                {'include_ingredients': ','.join(map(str, ingredients[:2]))},
+                {'exclude_ingredients': ingredients[0]},
+            ]
+        if tags and ingredients:
+            scenarios.append({
+                'cooking_time_max': 30,
+                'tags': tags[0],
+                'exclude_ingredients': ingredients[-1],
+            })
+        return scenarios
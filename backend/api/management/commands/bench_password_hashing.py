@@ -0,0 +1,64 @@
+import threading
+from statistics import median, quantiles
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from users.hashers import reset_pool
+
+
+class Command(BaseCommand):
+    help = ('Пропускная способность хеширования паролей и задержка '
+            'лёгкого запроса API во время волны входов: в текущем '
+            'процессе и в пуле процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--storm', type=int, default=8,
+                            help='одновременных входов')
+        parser.add_argument('--hashes', type=int, default=40,
+                            help='всего хешей за волну')
+        parser.add_argument('--path', default='/api/tags/')
+
+    def handle(self, *args, **options):
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        client = Client(HTTP_HOST=host)
+        client.get(options['path'])
+        for workers in (0, settings.PASSWORD_HASHING_WORKERS or 2):
+            with override_settings(PASSWORD_HASHING_WORKERS=workers):
+                reset_pool()
+                make_password('warm-up')
+                self.run_storm(client, workers, options)
+        reset_pool()
+
+    def run_storm(self, client, workers, options):
+        per_thread = max(1, options['hashes'] // options['storm'])
+
+        def login_storm():
+            for _ in range(per_thread):
+                make_password('benchmark-password')
+
+        threads = [threading.Thread(target=login_storm)
+                   for _ in range(options['storm'])]
+        started = perf_counter()
+        for thread in threads:
+            thread.start()
+        latencies = []
+        while any(thread.is_alive() for thread in threads):
+            request_started = perf_counter()
+            client.get(options['path'])
+            latencies.append(perf_counter() - request_started)
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - started
+        p99 = (quantiles(latencies, n=100)[-1] if len(latencies) > 1
+               else latencies[0])
+        mode = f'пул из {workers}' if workers else 'в процессе'
+        self.stdout.write(
+            f'{mode}: {per_thread * options["storm"] / elapsed:.1f} хешей/с; '
+            f'{options["path"]}: {len(latencies)} запросов, '
+            f'p50 {median(latencies) * 1000:.1f} мс, '
+            f'p99 {p99 * 1000:.1f} мс')
@@ -0,0 +1,70 @@
+import json
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.recipe_index import load_index
+from api.views import RecipeViewSet
+from recipes.models import Recipe, Tag
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает список рецептов для анонимного пользователя '
+            'из индекса в памяти и через ORM (без ограничения частоты '
+            'запросов).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'list'}, throttle_classes=())
+        queries = [{}, {'page': 2}, {'limit': 50}]
+        queries += [{'tags': slug} for slug in
+                    Tag.objects.values_list('slug', flat=True)[:3]]
+        author = Recipe.objects.values_list('author_id', flat=True).first()
+        if author is not None:
+            queries.append({'author': author})
+
+        def get(params):
+            response = view(factory.get('/api/recipes/', params,
+                                        HTTP_HOST=host))
+            if hasattr(response, 'render'):
+                response.render()
+            return response.content
+
+        with override_settings(RECIPE_INDEX_ENABLED=True):
+            started = perf_counter()
+            index = load_index()
+            build_time = perf_counter() - started
+            if index is None:
+                self.stderr.write('Индекс не построен, см. лог.')
+                return
+            self.stdout.write(
+                f'Индекс: {len(index.ids)} рецептов, '
+                f'{index.size / 1024:.0f} КБ, {build_time * 1000:.0f} мс')
+            for params in queries:
+                with override_settings(RECIPE_INDEX_ENABLED=False):
+                    orm_body = get(params)
+                    orm_time = self.measure(get, params, options['repeat'])
+                index_body = get(params)
+                index_time = self.measure(get, params, options['repeat'])
+                same = json.loads(orm_body) == json.loads(index_body)
+                self.stdout.write(
+                    f'{params or "без фильтров"}: ORM '
+                    f'{orm_time * 1000:.2f} мс, индекс '
+                    f'{index_time * 1000:.2f} мс, совпадает: {same}')
+
+    def measure(self, func, params, repeat):
+        best = None
+        for _ in range(repeat):
+            started = perf_counter()
+            func(params)
+            elapsed = perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
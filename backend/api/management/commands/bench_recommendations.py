@@ -0,0 +1,53 @@
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.read_serializers import recipe_rows
+from recipes.models import FavoriteRecipe
+from recipes.recommendations import (DEFAULT_TOP_K, compute_neighbors,
+                                     recommended_recipes)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Время построения похожих рецептов на синтетических данных '
+            'и время запроса рекомендаций для пользователей из базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--favorites', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=50_000)
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+        parser.add_argument('--queries', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        user_ids = rng.integers(0, options['users'], options['favorites'])
+        # Популярность рецептов убывает по степенному закону.
+        recipe_ids = (rng.random(options['favorites']) ** 3
+                      * options['recipes']).astype(np.int64)
+        pairs = np.unique(np.stack([user_ids, recipe_ids], axis=1), axis=0)
+        started = perf_counter()
+        sources, _, _ = compute_neighbors(pairs[:, 0], pairs[:, 1],
+                                          options['top_k'])
+        self.stdout.write(
+            f'Построение: {len(pairs)} избранных, {len(sources)} соседей, '
+            f'{perf_counter() - started:.1f} с')
+
+        users = User.objects.filter(id__in=list(
+            FavoriteRecipe.objects.order_by().values_list(
+                'user', flat=True).distinct()[:options['queries']]))
+        timings = []
+        for user in users:
+            started = perf_counter()
+            list(recipe_rows(recommended_recipes(user), user)[:6])
+            timings.append(perf_counter() - started)
+        if timings:
+            self.stdout.write(
+                f'Запрос: {len(timings)} пользователей, медиана '
+                f'{median(timings) * 1000:.1f} мс, максимум '
+                f'{max(timings) * 1000:.1f} мс')
@@ -0,0 +1,53 @@
+import gzip
+from time import perf_counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.read_serializers import recipe_rows, serialize_recipes
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient, Recipe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = ('Размер ответа (без сжатия, gzip, brotli) и время '
+            'сериализации для типичных ответов API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        payloads = {
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.all(), many=True).data,
+            'recipes': serialize_recipes(
+                recipe_rows(Recipe.objects.all(), AnonymousUser())[
+                    :options['limit']], None),
+        }
+        if orjson is None:
+            self.stdout.write('orjson не установлен, FastJSONRenderer '
+                              'использует стандартный json')
+        for name, data in payloads.items():
+            body = FastJSONRenderer().render(data)
+            sizes = [f'{len(body)} Б', f'gzip {len(gzip.compress(body, 5))} Б']
+            if brotli is not None:
+                sizes.append(f'brotli {len(brotli.compress(body))} Б')
+            self.stdout.write(f'{name}: ' + ', '.join(sizes))
+            for renderer in (JSONRenderer(), FastJSONRenderer()):
+                best = min(self.measure(renderer, data)
+                           for _ in range(options['repeat']))
+                self.stdout.write(f'  {type(renderer).__name__}: '
+                                  f'{best * 1000:.2f} мс')
+
+    def measure(self, renderer, data):
+        start = perf_counter()
+        renderer.render(data)
+        return perf_counter() - start
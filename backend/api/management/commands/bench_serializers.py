@@ -0,0 +1,61 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.read_serializers import recipe_rows, serialize_recipes
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает RecipeSerializer и облегчённый сериализатор '
+            'чтения: совпадение JSON и объекты в секунду.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--user', help='email пользователя для флагов')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        user = AnonymousUser()
+        if options['user']:
+            user = User.objects.get(email=options['user'])
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        request = Request(APIRequestFactory().get('/api/recipes/',
+                                                  HTTP_HOST=host))
+        request.user = user
+
+        def drf_serializer():
+            return RecipeSerializer(Recipe.objects.all()[:limit], many=True,
+                                    context={'request': request}).data
+
+        def read_serializer():
+            return serialize_recipes(
+                recipe_rows(Recipe.objects.all(), user)[:limit], request)
+
+        renderer = JSONRenderer()
+        same = (renderer.render(drf_serializer())
+                == renderer.render(read_serializer()))
+        self.stdout.write(f'JSON совпадает: {same}')
+        for name, func in (('RecipeSerializer', drf_serializer),
+                           ('read_serializers', read_serializer)):
+            best = min(self.measure(func) for _ in range(options['repeat']))
+            count = len(func())
+            self.stdout.write(
+                f'{name}: {count} объектов, {best * 1000:.1f} мс, '
+                f'{count / best:.0f} объектов/с')
+
+    def measure(self, func):
+        start = perf_counter()
+        func()
+        return perf_counter() - start
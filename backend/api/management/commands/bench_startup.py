@@ -0,0 +1,136 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)')
+WSGI_IMPORT = 'import foodgram.wsgi'
+MANAGE_PY = str(settings.BASE_DIR / 'manage.py')
+COLD_START_TARGETS = {
+    'manage.py check': [MANAGE_PY, 'check'],
+    'manage.py run_worker --stats': [MANAGE_PY, 'run_worker', '--stats'],
+    'wsgi': ['-c', WSGI_IMPORT],
+}
+HEAVY_MODULES = ('PIL.Image', 'djoser.views', 'drf_extra_fields.fields',
+                 'api.views')
+
+
+def read_status(pid):
+    """VmRSS и доли памяти процесса из /proc, в килобайтах."""
+    values = {}
+    for name in ('status', 'smaps_rollup'):
+        try:
+            with open(f'/proc/{pid}/{name}') as file:
+                for line in file:
+                    key, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        values[key] = int(value.split()[0])
+        except OSError:
+            pass
+    return values
+
+
+def gunicorn_processes():
+    """(pid, ppid) процессов gunicorn."""
+    processes = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as file:
+                cmdline = file.read()
+            with open(f'/proc/{pid}/stat') as file:
+                ppid = int(file.read().rsplit(')', 1)[1].split()[1])
+        except OSError:
+            continue
+        args = cmdline.split(b'\0')[:2]
+        if any(os.path.basename(arg).startswith(b'gunicorn') for arg in args):
+            processes.append((int(pid), ppid))
+    return processes
+
+
+class Command(BaseCommand):
+    help = ('Профиль запуска: время импорта модулей (-X importtime), '
+            'холодный старт команд и память воркеров gunicorn.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15,
+                            help='сколько пакетов показать')
+        parser.add_argument('--rss', action='store_true',
+                            help='память запущенных процессов gunicorn')
+        parser.add_argument('--cold', action='store_true',
+                            help='время холодного старта команд и WSGI')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['rss']:
+            self.show_rss()
+        elif options['cold']:
+            self.show_cold_start(options['repeat'])
+        else:
+            self.show_imports(options['top'])
+
+    def show_imports(self, top):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WSGI_IMPORT],
+            env=os.environ.copy(), capture_output=True, text=True,
+        )
+        if result.returncode:
+            self.stderr.write(result.stderr)
+            return
+        packages = defaultdict(int)
+        total = 0
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match is None:
+                continue
+            self_us, _, module = match.groups()
+            packages[module.split('.')[0]] += int(self_us)
+            total += int(self_us)
+        self.stdout.write(f'Импорт ({WSGI_IMPORT}): {total / 1000:.0f} мс')
+        for package, self_us in sorted(
+                packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'{self_us / 1000:8.1f} мс  {package}')
+
+    def show_cold_start(self, repeat):
+        """Медиана времени запуска в новом процессе и тяжёлые модули,
+        которые при этом импортируются.
+        """
+        for name, args in COLD_START_TARGETS.items():
+            timings = []
+            for _ in range(repeat):
+                started = perf_counter()
+                subprocess.run([sys.executable, *args], env=os.environ.copy(),
+                               capture_output=True, check=True)
+                timings.append(perf_counter() - started)
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', *args],
+                env=os.environ.copy(), capture_output=True, text=True,
+            )
+            imported = {match.group(3) for match in map(
+                IMPORT_LINE.match, result.stderr.splitlines()) if match}
+            heavy = [module for module in HEAVY_MODULES
+                     if module in imported]
+            self.stdout.write(
+                f'{name}: {median(timings) * 1000:.0f} мс, '
+                f'тяжёлые модули: {", ".join(heavy) or "нет"}')
+
+    def show_rss(self):
+        processes = gunicorn_processes()
+        if not processes:
+            self.stderr.write('Процессы gunicorn не найдены.')
+            return
+        pids = {pid for pid, _ in processes}
+        self.stdout.write('pid      роль     RSS, МБ  PSS, МБ  общая, МБ')
+        for pid, ppid in sorted(processes):
+            role = 'воркер' if ppid in pids else 'мастер'
+            status = read_status(pid)
+            shared = (status.get('Shared_Clean', 0)
+                      + status.get('Shared_Dirty', 0))
+            self.stdout.write(
+                f'{pid:<8} {role:<8} {status.get("VmRSS", 0) / 1024:7.1f}  '
+                f'{status.get("Pss", 0) / 1024:7.1f}  {shared / 1024:9.1f}')
@@ -0,0 +1,240 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import urls
+from api.queries import QueryLog
+from recipes.commit_hooks import captured_commit_hooks, run_hooks
+from recipes.models import Follow, Ingredient, IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+PIXEL = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFc'
+         'SJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+SAMPLE_MODELS = {
+    'tag': Tag,
+    'ingredient': Ingredient,
+    'recipe': Recipe,
+}
+
+
+def api_routes(patterns=urls.urlpatterns):
+    """Маршруты api/urls.py по одному на имя: без вариантов с суффиксом
+    формата и без перекрытых повторов (djoser подключает users дважды).
+    """
+    seen = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            nested = [route for route in api_routes(pattern.url_patterns)
+                      if route.name not in seen]
+            seen.update(route.name for route in nested)
+            yield from nested
+        elif ('format' not in pattern.pattern.regex.groupindex
+              and pattern.name not in seen):
+            seen.add(pattern.name)
+            yield pattern
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все маршруты api/urls.py на текущих данных при '
+            'нескольких размерах страницы (пачки, числа ингредиентов) '
+            'и сверяет число SQL-запросов с бюджетами вьюсетов '
+            '(query_budgets). Ошибка, если бюджет превышен или число '
+            'запросов растёт с размером страницы (N+1). Все изменения '
+            'откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,6,50',
+                            help='размеры страниц через запятую')
+        parser.add_argument('--user', help='email пользователя, '
+                                           'по умолчанию первый')
+
+    def handle(self, *args, **options):
+        sizes = sorted({int(size) for size in options['sizes'].split(',')})
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(email=options['user'])
+        self.user = users.first()
+        self.author = User.objects.exclude(
+            pk=getattr(self.user, 'pk', None)).order_by('id').first()
+        self.recipe = Recipe.objects.order_by('id').first()
+        if not (self.user and self.author and self.recipe):
+            raise CommandError('Нужны два пользователя и хотя бы один '
+                               'рецепт.')
+        self.recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True)[:sizes[-1]])
+        self.author_ids = list(User.objects.exclude(pk=self.user.pk).order_by(
+            'id').values_list('id', flat=True)[:sizes[-1]])
+        self.ingredient_ids = list(Ingredient.objects.order_by(
+            'id').values_list('id', flat=True)[:sizes[-1]])
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True)[:1])
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        self.client = APIClient(HTTP_HOST=host)
+        problems, skipped = [], []
+        with override_settings(QUERY_BUDGET_ENFORCE=False,
+                               RECIPE_INDEX_ENABLED=False), \
+                transaction.atomic():
+            token, _ = Token.objects.get_or_create(user=self.user)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            for route in api_routes():
+                view = route.callback.cls
+                actions = getattr(route.callback, 'actions', None) or {
+                    method: method for method in ('get', 'post')
+                    if hasattr(view, method)}
+                for method, action in actions.items():
+                    scenario = self.scenario(route, method)
+                    if scenario is None:
+                        skipped.append(f'{method.upper()} {route.name}')
+                        continue
+                    budget = getattr(view, 'query_budgets', {}).get(action)
+                    problems += self.check_route(
+                        route.name, method, action, budget, scenario, sizes)
+            transaction.set_rollback(True)
+        if skipped:
+            self.stdout.write('Не проверяются (учётные записи, токены): '
+                              + ', '.join(skipped))
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Бюджеты запросов соблюдены.'))
+
+    def check_route(self, name, method, action, budget, scenario, sizes):
+        """Запрос при каждом размере в отдельной точке сохранения."""
+        counts, problems = [], []
+        for size in sizes:
+            with transaction.atomic():
+                if method != 'get':
+                    size = min(size, self.max_size(name))
+                with captured_commit_hooks() as hooks:
+                    path, data = scenario(size)
+                    run_hooks(hooks)
+                    log = QueryLog(with_origin=True)
+                    with connection.execute_wrapper(log):
+                        response = self.send(method, path, data)
+                        run_hooks(hooks)
+                transaction.set_rollback(True)
+            counts.append(len(log))
+            if response.status_code >= 500:
+                problems.append(f'{method.upper()} {path}: ответ '
+                                f'{response.status_code}')
+        label = f'{method.upper()} {name} ({action})'
+        if budget is not None and max(counts) > budget:
+            problems.append(f'{label}: {max(counts)} запросов при бюджете '
+                            f'{budget}')
+        if counts[-1] > counts[0]:
+            repeated = '; '.join(
+                f'{count}× {field or location}'
+                for _, count, (field, location) in log.repeated(
+                    settings.QUERY_REPEAT_THRESHOLD))
+            problems.append(f'{label}: число запросов растёт с размером '
+                            f'{counts}: {repeated}')
+        self.stdout.write(
+            f'{label:60} {response.status_code} запросов {counts} '
+            f'бюджет {budget if budget is not None else "не задан"}')
+        return problems
+
+    def max_size(self, name):
+        if name.startswith('subscribe'):
+            return len(self.author_ids)
+        if name.startswith('recipe-'):
+            return len(self.ingredient_ids)
+        return len(self.recipe_ids)
+
+    def send(self, method, path, data=None):
+        if method == 'get':
+            response = self.client.get(path, data)
+        else:
+            response = getattr(self.client, method)(path, data,
+                                                    format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def scenario(self, route, method):
+        """Функция size -> (путь, данные) для маршрута и метода или None,
+        если маршрут не проверяется.
+        """
+        kwargs = {name: self.sample_id(route.name)
+                  for name in route.pattern.regex.groupindex}
+        path = reverse(f'api:{route.name}', kwargs=kwargs)
+        if method == 'get':
+            return lambda size: (path, {'limit': size,
+                                        'recipes_limit': size})
+        bulk_keys = {'favorite_bulk': 'recipes',
+                     'shopping_cart_bulk': 'recipes',
+                     'subscribe_bulk': 'authors'}
+        if route.name in ('favorite', 'shopping_cart', 'subscribe'):
+            return self.toggle(path, method, lambda size: None)
+        if route.name in bulk_keys:
+            key = bulk_keys[route.name]
+            ids = self.author_ids if key == 'authors' else self.recipe_ids
+            return self.toggle(path, method,
+                               lambda size: {key: ids[:size]})
+        if (route.name, method) == ('customuser-create-subscription',
+                                    'post'):
+            def scenario(size):
+                Follow.objects.filter(user=self.user,
+                                      author=self.author).delete()
+                return path, {'author_id': self.author.id}
+            return scenario
+        if (route.name, method) == ('recipe-list', 'post'):
+            return lambda size: (path, self.recipe_data(size))
+        if route.name == 'recipe-detail' and method in ('put', 'patch',
+                                                        'delete'):
+            return self.own_recipe(method)
+        return None
+
+    def toggle(self, path, method, data):
+        """Добавление проверяется после удаления, удаление — после
+        добавления, чтобы мерить успешный ответ при любых данных.
+        """
+        opposite = 'delete' if method == 'post' else 'post'
+
+        def scenario(size):
+            self.send(opposite, path, data(size))
+            return path, data(size)
+        return scenario
+
+    def own_recipe(self, method):
+        """Изменение и удаление — на рецепте, созданном в точке
+        сохранения, чтобы не трогать кеш карточек существующих рецептов.
+        """
+        def scenario(size):
+            recipe = Recipe.objects.create(
+                author=self.user, name='query budget', text='query budget',
+                cooking_time=1)
+            recipe.tags.set(self.tag_ids)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                                 amount=1)
+                for ingredient_id in self.ingredient_ids[:size])
+            path = reverse('api:recipe-detail', kwargs={'pk': recipe.pk})
+            data = None if method == 'delete' else self.recipe_data(size)
+            return path, data
+        return scenario
+
+    def recipe_data(self, size):
+        return {
+            'name': 'query budget',
+            'text': 'query budget',
+            'cooking_time': 1,
+            'image': PIXEL,
+            'tags': self.tag_ids,
+            'ingredients': [{'id': ingredient_id, 'amount': 1}
+                            for ingredient_id in self.ingredient_ids[:size]],
+        }
+
+    def sample_id(self, name):
+        prefix = name.split('-')[0]
+        if prefix in SAMPLE_MODELS:
+            sample = SAMPLE_MODELS[prefix].objects.order_by('id').first()
+            return sample.pk if sample else 0
+        if name.startswith('subscribe') or prefix == 'customuser':
+            return self.author.pk
+        return self.recipe.pk
@@ -0,0 +1,34 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from api.queries import QueryLog
+
+logger = logging.getLogger(__name__)
+
+
+class QueryShapeMiddleware:
+    """Только для разработки (DEBUG): ищет N+1 — одинаковые по форме
+    запросы, повторённые в одном запросе к API не меньше
+    QUERY_REPEAT_THRESHOLD раз, и пишет в лог поле сериализатора
+    и строку кода, откуда они пришли. Число запросов — в X-Query-Count.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog(with_origin=True)
+        with connection.execute_wrapper(log):
+            response = self.get_response(request)
+            if not getattr(response, 'is_rendered', True):
+                response.render()
+        response['X-Query-Count'] = len(log)
+        for shape, count, (field, location) in log.repeated(
+                settings.QUERY_REPEAT_THRESHOLD):
+            logger.warning(
+                '%s %s: %d одинаковых запросов из %s (%s): %s',
+                request.method, request.path, count,
+                field or 'кода вне сериализатора', location, shape)
+        return response
@@ -1,8 +1,86 @@
+from collections.abc import Mapping
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef, UniqueConstraint
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 
-from api.constants import RECIPE_NOT_FOUND_ERROR
+from api.constants import (BULK_IDS_FORMAT_ERROR, BULK_IDS_LIMIT_ERROR,
+                           RECIPE_NOT_FOUND_ERROR)
 from recipes.models import Recipe
+from recipes.scores import record_list_change
+
+BULK_ADDED = 'added'
+BULK_REMOVED = 'removed'
+BULK_ALREADY_ADDED = 'already_added'
+BULK_NOT_IN_LIST = 'not_in_list'
+BULK_NOT_FOUND = 'not_found'
+BULK_FORBIDDEN = 'forbidden'
+
+# Границы bigint: id вне их PostgreSQL отвергает с DataError.
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id(obj_id):
+    """Целое число или строка из цифр; иначе None (1.9, True, '1e3')."""
+    if isinstance(obj_id, str) and obj_id.strip().lstrip('-').isdigit():
+        obj_id = int(obj_id)
+    if type(obj_id) is not int or not MIN_ID <= obj_id <= MAX_ID:
+        return None
+    return obj_id
+
+
+def insert_links(list_model, user, field, ids):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING: id, которые вставил
+    именно этот запрос; строки, добавленные параллельным запросом,
+    не возвращаются (PostgreSQL и SQLite 3.35+).
+    """
+    quote = connection.ops.quote_name
+    column = quote(list_model._meta.get_field(field).column)
+    values = ', '.join(['(%s, %s)'] * len(ids))
+    params = [value for obj_id in ids for value in (user.pk, obj_id)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(list_model._meta.db_table)} '
+            f'({quote("user_id")}, {column}) VALUES {values} '
+            f'ON CONFLICT DO NOTHING RETURNING {column}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_links(list_model, user, field, ids):
+    """DELETE ... RETURNING: id, которые удалил именно этот запрос."""
+    quote = connection.ops.quote_name
+    column = quote(list_model._meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(list_model._meta.db_table)} '
+            f'WHERE {quote("user_id")} = %s AND {column} IN ({placeholders}) '
+            f'RETURNING {column}', [user.pk, *ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def is_unique_violation(error, model):
+    """Проверяет, что IntegrityError вызвана уникальным ограничением модели,
+    а не, например, нарушением внешнего ключа или проверочным ограничением.
+    """
+    unique = [constraint for constraint in model._meta.constraints
+              if isinstance(constraint, UniqueConstraint)]
+    diag = getattr(error.__cause__, 'diag', None)
+    constraint_name = getattr(diag, 'constraint_name', None)
+    if constraint_name:
+        return constraint_name in {constraint.name for constraint in unique}
+    # SQLite не сообщает имя ограничения, только его столбцы.
+    message = str(error)
+    table = model._meta.db_table
+    return any(
+        message == 'UNIQUE constraint failed: ' + ', '.join(
+            f'{table}.{model._meta.get_field(field).column}'
+            for field in constraint.fields)
+        for constraint in unique
+    )
 
 
 class RecipeActionMixin:
@@ -22,11 +100,15 @@ class RecipeActionMixin:
             return Response(RECIPE_NOT_FOUND_ERROR,
                             status=status.HTTP_400_BAD_REQUEST)
 
-        if list_model.objects.filter(user=request.user,
-                                     recipe=recipe).exists():
+        try:
+            with transaction.atomic():
+                list_model.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError as error:
+            if not is_unique_violation(error, list_model):
+                raise
             return Response(error_response,
                             status=status.HTTP_400_BAD_REQUEST)
-        list_model.objects.create(user=request.user, recipe=recipe)
+        record_list_change(list_model, [recipe.id])
         serializer = self.get_serializer()
         return Response(
             serializer.to_representation(instance=recipe),
@@ -37,17 +119,99 @@ class RecipeActionMixin:
                                 recipe_id,
                                 list_model,
                                 error_response):
-        recipe = self.get_recipe(recipe_id)
-        if not recipe:
+        deleted, _ = list_model.objects.filter(
+            user=request.user,
+            recipe_id=recipe_id).delete()
+        if deleted:
+            record_list_change(list_model, [recipe_id], added=False)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not Recipe.objects.filter(id=recipe_id).exists():
             return Response(RECIPE_NOT_FOUND_ERROR,
                             status=status.HTTP_404_NOT_FOUND)
+        return Response(error_response,
+                        status=status.HTTP_400_BAD_REQUEST)
 
-        user_id = request.user.id
-        if not list_model.objects.filter(user__id=user_id,
-                                         recipe__id=recipe_id).exists():
-            return Response(error_response,
-                            status=status.HTTP_400_BAD_REQUEST)
-        list_model.objects.filter(
-            user__id=user_id,
-            recipe__id=recipe_id).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class BulkActionMixin:
+    """Пакетное добавление/удаление связей пользователя
+    (избранное, список покупок, подписки).
+    Число запросов к БД не зависит от количества id в запросе.
+    """
+    bulk_max_items = 100
+
+    def get_bulk_ids(self, request, key):
+        """Список уникальных id из тела запроса в исходном порядке."""
+        if hasattr(request.data, 'getlist'):
+            ids = request.data.getlist(key)
+        elif isinstance(request.data, Mapping):
+            ids = request.data.get(key)
+        else:
+            raise ValidationError({key: BULK_IDS_FORMAT_ERROR})
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({key: BULK_IDS_FORMAT_ERROR})
+        if len(ids) > self.bulk_max_items:
+            raise ValidationError(
+                {key: BULK_IDS_LIMIT_ERROR.format(limit=self.bulk_max_items)})
+        ids = [parse_id(obj_id) for obj_id in ids]
+        if None in ids:
+            raise ValidationError({key: BULK_IDS_FORMAT_ERROR})
+        return list(dict.fromkeys(ids))
+
+    def get_bulk_targets(self, request, ids, target_model, list_model, field):
+        """Один запрос: какие id существуют и какие уже в списке."""
+        in_list = list_model.objects.filter(user=request.user,
+                                            **{field: OuterRef('pk')})
+        return dict(
+            target_model.objects.filter(id__in=ids).annotate(
+                in_list=Exists(in_list)
+            ).values_list('id', 'in_list')
+        )
+
+    def bulk_add_to_list(self, request, ids, target_model, list_model,
+                         field, forbidden=()):
+        """Статус added получают только id, которые вставил этот запрос:
+        строку, добавленную параллельно, он не считает своей.
+        """
+        targets = self.get_bulk_targets(request, ids, target_model,
+                                        list_model, field)
+        candidates = [obj_id for obj_id in ids
+                      if obj_id in targets and obj_id not in forbidden
+                      and not targets[obj_id]]
+        added = set()
+        if candidates:
+            added = set(insert_links(list_model, request.user, field,
+                                     candidates))
+            record_list_change(list_model, sorted(added))
+        results = []
+        for obj_id in ids:
+            if obj_id not in targets:
+                item_status = BULK_NOT_FOUND
+            elif obj_id in forbidden:
+                item_status = BULK_FORBIDDEN
+            elif obj_id in added:
+                item_status = BULK_ADDED
+            else:
+                item_status = BULK_ALREADY_ADDED
+            results.append({'id': obj_id, 'status': item_status})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def bulk_remove_from_list(self, request, ids, target_model, list_model,
+                              field):
+        targets = self.get_bulk_targets(request, ids, target_model,
+                                        list_model, field)
+        present = [obj_id for obj_id in ids if targets.get(obj_id)]
+        removed = set()
+        if present:
+            removed = set(delete_links(list_model, request.user, field,
+                                       present))
+            record_list_change(list_model, sorted(removed), added=False)
+        results = []
+        for obj_id in ids:
+            if obj_id not in targets:
+                item_status = BULK_NOT_FOUND
+            elif obj_id in removed:
+                item_status = BULK_REMOVED
+            else:
+                item_status = BULK_NOT_IN_LIST
+            results.append({'id': obj_id, 'status': item_status})
+        return Response({'results': results}, status=status.HTTP_200_OK)
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
@@ -6,3 +6,14 @@ class CustomPagination(PageNumberPagination):
     Кастомный пагинатор - ожидается параметр limit."""
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class UserListPagination(CursorPagination):
+    """Курсорная пагинация списков пользователя (избранное, покупки)
+    по id записи: без COUNT и OFFSET, страница берётся по индексу
+    (user, -id).
+    """
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
@@ -0,0 +1,119 @@
+"""Учёт SQL-запросов: бюджет запросов на эндпоинт и поиск N+1.
+
+query_budget — контекстный менеджер и декоратор: падает, если внутри
+выполнено больше запросов, чем объявлено. Вьюсеты объявляют бюджеты
+по действиям в query_budgets (QueryBudgetMixin), команда
+check_query_budgets прогоняет по ним все маршруты api/urls.py.
+"""
+import re
+import sys
+from collections import Counter
+from contextlib import ContextDecorator
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.fields import Field
+
+IN_LIST = re.compile(r'\(%s(?:, %s)+\)')
+
+ORIGIN_METHODS = ('to_representation', 'get_attribute')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """SQL без зависимости от длины списков в IN (...)."""
+    return IN_LIST.sub('(%s, ...)', sql)
+
+
+def query_origin():
+    """Поле сериализатора и строка кода проекта, откуда пришёл запрос."""
+    field = location = None
+    frame = sys._getframe(2)
+    while frame is not None and not (field and location):
+        owner = frame.f_locals.get('self')
+        if (field is None and frame.f_code.co_name in ORIGIN_METHODS
+                and isinstance(owner, Field) and owner.field_name):
+            field = f'{type(owner.parent).__name__}.{owner.field_name}'
+        filename = frame.f_code.co_filename
+        if (location is None and filename.startswith(str(settings.BASE_DIR))
+                and filename != __file__):
+            location = (f'{Path(filename).relative_to(settings.BASE_DIR)}:'
+                        f'{frame.f_lineno}')
+        frame = frame.f_back
+    return field, location
+
+
+class QueryLog:
+    """execute_wrapper: запоминает выполненные запросы, с with_origin —
+    ещё и их источник (медленно, только для разработки).
+    """
+
+    def __init__(self, with_origin=False):
+        self.with_origin = with_origin
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        origin = query_origin() if self.with_origin else None
+        self.queries.append((sql, origin))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold):
+        """Формы запросов, выполненные не меньше threshold раз:
+        [(форма, число, источник первого запроса)].
+        """
+        shapes = Counter(sql_shape(sql) for sql, _ in self.queries)
+        origins = {}
+        for sql, origin in self.queries:
+            origins.setdefault(sql_shape(sql), origin)
+        return [(shape, count, origins[shape])
+                for shape, count in shapes.most_common()
+                if count >= threshold]
+
+
+class query_budget(ContextDecorator):
+    """Не больше max_queries запросов внутри блока или функции."""
+
+    def __init__(self, max_queries, using='default'):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.log = QueryLog()
+        self.wrapper = connections[self.using].execute_wrapper(self.log)
+        self.wrapper.__enter__()
+        return self.log
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wrapper.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self.log) > self.max_queries:
+            queries = '\n'.join(sql for sql, _ in self.log.queries)
+            raise QueryBudgetExceeded(
+                f'{len(self.log)} запросов при бюджете '
+                f'{self.max_queries}:\n{queries}')
+        return False
+
+
+class QueryBudgetMixin:
+    """Бюджет запросов на действие вьюсета: query_budgets = {action: n}.
+    Проверяется весь запрос (аутентификация, права, ответ), только при
+    QUERY_BUDGET_ENFORCE, чтобы в продакшене не было накладных расходов.
+    """
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        budget = self.query_budgets.get(action)
+        if budget is None or not settings.QUERY_BUDGET_ENFORCE:
+            return super().dispatch(request, *args, **kwargs)
+        with query_budget(budget):
+            response = super().dispatch(request, *args, **kwargs)
+            if not getattr(response, 'is_rendered', True):
+                response.render()
+        return response
@@ -0,0 +1,239 @@
+"""Облегчённые сериализаторы для чтения списков.
+
+Работают со строками из .values() и возвращают те же словари, что и
+RecipeSerializer / FollowSerializer, но без полей DRF на каждый объект.
+Связанные теги и ингредиенты загружаются одним запросом на страницу.
+"""
+from collections import defaultdict
+
+from django.db.models import (CharField, Exists, F, IntegerField, OuterRef,
+                              Subquery, Value)
+
+from recipes.models import (FavoriteRecipe, Follow, IngredientRecipe, Recipe,
+                            ShoppingList)
+from recipes.scores import count_of
+
+RECIPE_FIELDS = (
+    'id',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+    'version',
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'nutrition__calories',
+    'nutrition__price',
+)
+
+FOLLOW_FIELDS = (
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+)
+
+SHORT_RECIPE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+
+USER_LIST_FIELDS = ('id', 'recipe_id', 'recipe__name', 'recipe__image',
+                    'recipe__cooking_time')
+
+RELATED_COLUMNS = ('kind', 'position', 'owner', 'item', 'title', 'unit',
+                   'slug', 'quantity')
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def image_url(name, request=None):
+    """Ссылка на картинку так же, как её строит ImageField в DRF."""
+    if not name:
+        return None
+    url = image_storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def decimal_string(value, places=2):
+    """Decimal строкой, как DecimalField в DRF."""
+    if value is None:
+        return None
+    return f'{value:.{places}f}'
+
+
+def recipe_rows(queryset, user):
+    """Строки рецептов с флагами текущего пользователя."""
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+        return queryset.values(*RECIPE_FIELDS, 'is_favorited',
+                               'is_in_shopping_cart', 'is_subscribed')
+    return queryset.values(*RECIPE_FIELDS)
+
+
+TAG_ROW = 0
+INGREDIENT_ROW = 1
+
+
+def related_by_recipe(recipe_ids):
+    """Теги и ингредиенты рецептов одним запросом (UNION ALL).
+    Колонки обеих частей идут в порядке annotate, поэтому совпадают.
+    """
+    tag_rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by().annotate(
+        kind=Value(TAG_ROW, IntegerField()),
+        position=-F('tag_id'),
+        owner=F('recipe_id'),
+        item=F('tag_id'),
+        title=F('tag__name'),
+        unit=F('tag__color'),
+        slug=F('tag__slug'),
+        quantity=Value(None, IntegerField()),
+    ).values_list(*RELATED_COLUMNS)
+    ingredient_rows = IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by().annotate(
+        kind=Value(INGREDIENT_ROW, IntegerField()),
+        position=-F('id'),
+        owner=F('recipe_id'),
+        item=F('id'),
+        title=F('ingredient__name'),
+        unit=F('ingredient__measurement_unit'),
+        slug=Value(None, CharField()),
+        quantity=F('amount'),
+    ).values_list(*RELATED_COLUMNS)
+    tags = defaultdict(list)
+    ingredients = defaultdict(list)
+    rows = tag_rows.union(ingredient_rows, all=True).order_by(
+        'kind', 'position')
+    for kind, _, recipe_id, item_id, name, unit, slug, amount in rows:
+        if kind == TAG_ROW:
+            tags[recipe_id].append(
+                {'id': item_id, 'color': unit, 'name': name, 'slug': slug})
+        else:
+            ingredients[recipe_id].append({
+                'id': item_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+    return tags, ingredients
+
+
+def serialize_recipe(row, tags, ingredients, request):
+    """Аналог RecipeSerializer(recipe).data для строки recipe_rows."""
+    return {
+        'id': row['id'],
+        'tags': tags,
+        'author': {
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': row.get('is_subscribed', False),
+        },
+        'ingredients': ingredients,
+        'is_favorited': row.get('is_favorited', False),
+        'is_in_shopping_cart': row.get('is_in_shopping_cart', False),
+        'name': row['name'],
+        'image': image_url(row['image'], request),
+        'text': row['text'],
+        'cooking_time': row['cooking_time'],
+        'calories': row['nutrition__calories'],
+        'price': decimal_string(row['nutrition__price']),
+    }
+
+
+def serialize_recipes(rows, request):
+    """Аналог RecipeSerializer(many=True).data для строк recipe_rows."""
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    tags, ingredients = related_by_recipe(recipe_ids)
+    return [
+        serialize_recipe(row, tags.get(row['id'], []),
+                         ingredients.get(row['id'], []), request)
+        for row in rows
+    ]
+
+
+def serialize_short_recipe(row, request=None):
+    """Аналог FollowRecipeSerializer для строки рецепта."""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'image': image_url(row['image'], request),
+        'cooking_time': row['cooking_time'],
+    }
+
+
+def serialize_user_list(rows, request):
+    """Рецепты из избранного или списка покупок (строки USER_LIST_FIELDS)
+    в формате FollowRecipeSerializer.
+    """
+    return [
+        {
+            'id': row['recipe_id'],
+            'name': row['recipe__name'],
+            'image': image_url(row['recipe__image'], request),
+            'cooking_time': row['recipe__cooking_time'],
+        }
+        for row in rows
+    ]
+
+
+def follow_rows(queryset):
+    """Строки подписок для serialize_follows с числом рецептов автора."""
+    return queryset.annotate(
+        recipes_count=count_of(Recipe.objects, 'author', 'author_id'),
+    ).values(*FOLLOW_FIELDS, 'recipes_count')
+
+
+def recipes_limit(request):
+    limit = request.GET.get('recipes_limit', '')
+    return int(limit) if limit.isdigit() else None
+
+
+def serialize_follows(rows, request):
+    """Аналог FollowSerializer(many=True).data для строк follow_rows.
+    С recipes_limit из базы читаются только первые N рецептов каждого
+    автора (коррелированный подзапрос по индексу author, -pub_date).
+    """
+    rows = list(rows)
+    limit = recipes_limit(request)
+    recipes = defaultdict(list)
+    recipe_queryset = Recipe.objects.filter(
+        author_id__in=[row['author_id'] for row in rows]
+    ).order_by('-pub_date', '-id')
+    if limit is not None:
+        recipe_queryset = recipe_queryset.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author_id=OuterRef('author_id'),
+            ).order_by('-pub_date', '-id').values('pk')[:limit]))
+    for recipe in recipe_queryset.values('author_id', *SHORT_RECIPE_FIELDS):
+        recipes[recipe['author_id']].append(recipe)
+    result = []
+    for row in rows:
+        result.append({
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': True,
+            'recipes': [serialize_short_recipe(recipe)
+                        for recipe in recipes.get(row['author_id'], [])],
+            'recipes_count': row['recipes_count'],
+        })
+    return result
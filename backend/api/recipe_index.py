@@ -0,0 +1,233 @@
+"""Индекс рецептов в памяти воркера для анонимного просмотра списка.
+
+Рецепты лежат в порядке выдачи (-pub_date) компактными массивами:
+id, автор и битовая маска тегов. Для каждого рецепта заранее отрисован
+JSON-фрагмент, поэтому запрос с фильтром по тегам и автору собирается
+без обращения к базе. Индекс перестраивается в фоновом потоке, когда
+меняется версия рецептов в базе (recipes.signals.recipes_version),
+и включается настройкой RECIPE_INDEX_ENABLED.
+"""
+import logging
+import sys
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.paginations import CustomPagination
+from api.read_serializers import recipe_rows, serialize_recipes
+from api.renderers import FastJSONRenderer
+from recipes.models import Recipe, Tag
+from recipes.signals import recipes_version
+
+logger = logging.getLogger(__name__)
+
+INDEX_PARAMS = {'tags', 'author', 'page', 'limit'}
+IMAGE_PLACEHOLDER = '\x00image\x00'
+MAX_TAGS = 63
+BUILD_BATCH_SIZE = 1000
+
+renderer = FastJSONRenderer()
+
+
+def render(data):
+    """JSON как у FastJSONRenderer; None рендерер превращает в пустое тело."""
+    if data is None:
+        return b'null'
+    return renderer.render(data)
+
+
+class RecipeIndex:
+    """Снимок выдачи рецептов для анонимного пользователя."""
+
+    def __init__(self, version):
+        self.version = version
+        self.ids = array('q')
+        self.authors = array('q')
+        self.masks = array('Q')
+        self.fragments = []
+        self.by_author = defaultdict(lambda: array('l'))
+        self.tag_bits = {}
+        self.size = 0
+
+    def add(self, item, mask):
+        position = len(self.ids)
+        self.ids.append(item['id'])
+        self.authors.append(item['author']['id'])
+        self.masks.append(mask)
+        self.by_author[item['author']['id']].append(position)
+        url = item['image']
+        item['image'] = IMAGE_PLACEHOLDER if url else None
+        prefix, _, suffix = render(item).partition(
+            render(IMAGE_PLACEHOLDER))
+        self.fragments.append((prefix, url, suffix))
+        self.size += (sys.getsizeof(prefix) + sys.getsizeof(suffix)
+                      + sys.getsizeof(url) + 3 * 8 + 64)
+
+    def positions(self, mask, author):
+        if author is not None:
+            candidates = self.by_author.get(author, ())
+        else:
+            candidates = range(len(self.ids))
+        if not mask:
+            return candidates
+        masks = self.masks
+        return [i for i in candidates if masks[i] & mask]
+
+    def parse(self, request):
+        """Маска тегов, автор, номер и размер страницы
+        или None, если запрос должен обработать ORM.
+        """
+        params = request.query_params
+        if not set(params) <= INDEX_PARAMS:
+            return None
+        mask = 0
+        for slug in params.getlist('tags'):
+            if slug not in self.tag_bits:
+                return None
+            mask |= self.tag_bits[slug]
+        author = params.get('author')
+        if author is not None:
+            if not author.isdigit() or int(author) not in self.by_author:
+                return None
+            author = int(author)
+        page = params.get('page', '1')
+        if not page.isdigit() or int(page) < 1:
+            return None
+        page_size = CustomPagination().get_page_size(request)
+        return mask, author, int(page), page_size
+
+    def page(self, request):
+        """Тело ответа со страницей рецептов или None."""
+        parsed = self.parse(request)
+        if parsed is None:
+            return None
+        mask, author, page, page_size = parsed
+        positions = self.positions(mask, author)
+        count = len(positions)
+        pages = max(1, -(-count // page_size))
+        if page > pages:
+            return None
+        url = request.build_absolute_uri()
+        next_url = previous_url = None
+        if page < pages:
+            next_url = replace_query_param(url, 'page', page + 1)
+        if page == 2:
+            previous_url = remove_query_param(url, 'page')
+        elif page > 2:
+            previous_url = replace_query_param(url, 'page', page - 1)
+        results = []
+        for position in positions[(page - 1) * page_size:page * page_size]:
+            prefix, image, suffix = self.fragments[position]
+            if image is None:
+                results.append(prefix)
+            else:
+                results.append(b''.join((
+                    prefix, render(request.build_absolute_uri(image)),
+                    suffix)))
+        return b''.join((
+            b'{"count":', str(count).encode(),
+            b',"next":', render(next_url),
+            b',"previous":', render(previous_url),
+            b',"results":[', b','.join(results), b']}',
+        ))
+
+
+def build_index(version):
+    """Строит индекс или возвращает None, если он не помещается
+    в RECIPE_INDEX_MAX_BYTES.
+    """
+    index = RecipeIndex(version)
+    tags = Tag.objects.order_by('id').values_list('id', 'slug')
+    if len(tags) > MAX_TAGS:
+        logger.warning('Индекс рецептов отключён: больше %s тегов', MAX_TAGS)
+        return None
+    bit_by_tag = {tag_id: 1 << bit for bit, (tag_id, _) in enumerate(tags)}
+    used_slugs = set(Recipe.tags.through.objects.values_list(
+        'tag__slug', flat=True))
+    index.tag_bits = {slug: bit_by_tag[tag_id] for tag_id, slug in tags
+                      if slug in used_slugs}
+    rows = recipe_rows(Recipe.objects.order_by('-pub_date', '-id'),
+                       AnonymousUser())
+    batch = []
+    for row in rows.iterator(chunk_size=BUILD_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BUILD_BATCH_SIZE:
+            add_batch(index, batch, bit_by_tag)
+            batch = []
+            if index.size > settings.RECIPE_INDEX_MAX_BYTES:
+                logger.warning('Индекс рецептов отключён: больше %s байт',
+                               settings.RECIPE_INDEX_MAX_BYTES)
+                return None
+    add_batch(index, batch, bit_by_tag)
+    if index.size > settings.RECIPE_INDEX_MAX_BYTES:
+        return None
+    index.by_author = dict(index.by_author)
+    return index
+
+
+def add_batch(index, rows, bit_by_tag):
+    items = serialize_recipes(rows, None)
+    for item in items:
+        mask = 0
+        for tag in item['tags']:
+            mask |= bit_by_tag[tag['id']]
+        index.add(item, mask)
+
+
+_state = {'index': None, 'version': None, 'checked_at': None}
+_lock = threading.Lock()
+
+
+def load_index(version=None):
+    if version is None:
+        version = recipes_version()
+    started = time.monotonic()
+    index = build_index(version)
+    _state.update(index=index, version=version)
+    if index is not None:
+        logger.info('Индекс рецептов: %s рецептов, %s байт, %.2f с',
+                    len(index.ids), index.size, time.monotonic() - started)
+    return index
+
+
+def rebuild_index(version):
+    try:
+        load_index(version)
+    except Exception:
+        logger.exception('Не удалось перестроить индекс рецептов')
+    finally:
+        connections.close_all()
+        _lock.release()
+
+
+def get_index():
+    """Текущий индекс или None. Версия проверяется не чаще раза
+    в RECIPE_INDEX_POLL_SECONDS; новый индекс строится в фоновом
+    потоке, а запросы до его готовности отвечают по старому.
+    """
+    if not settings.RECIPE_INDEX_ENABLED:
+        return None
+    now = time.monotonic()
+    checked_at = _state['checked_at']
+    if (checked_at is None
+            or now - checked_at >= settings.RECIPE_INDEX_POLL_SECONDS):
+        _state['checked_at'] = now
+        version = recipes_version()
+        if version != _state['version'] and _lock.acquire(blocking=False):
+            threading.Thread(target=rebuild_index, args=(version,),
+                             name='recipe-index', daemon=True).start()
+    return _state['index']
+
+
+def serve_from_index(request):
+    """Тело ответа для списка рецептов из памяти или None."""
+    index = get_index()
+    if index is None:
+        return None
+    return index.page(request)
@@ -1,6 +1,8 @@
 from drf_extra_fields.fields import Base64ImageField
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.serializers import SerializerMethodField
@@ -17,10 +19,13 @@ from api.constants import (IMAGE_NOT_IN_RECIPE, INGREDIENT_ALREADY_ADDED,
                            INVALID_CHARTERS_IN_USRNAME)
 from recipes.models import (Follow, Ingredient, IngredientRecipe, Recipe,
                             FavoriteRecipe, ShoppingList, Tag)
+from recipes.nutrition import refresh_recipes_now
 
 
 User = get_user_model()
 
+USER_COUNT_FIELDS = ('recipes_count', 'followers_count')
+
 
 class CustomUserSerializer(UserSerializer):
     """Сериализатор для получения списка
@@ -39,12 +44,24 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        """Проверка подписки пользователя"""
+        """Проверка подписки пользователя.
+        В списке пользователей флаг уже посчитан в запросе (аннотация).
+        """
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return Follow.objects.filter(user=user, author=obj.id).exists()
 
+    def to_representation(self, instance):
+        """Счётчики добавляются, если запрошены (?with_counts=1)."""
+        data = super().to_representation(instance)
+        for field in USER_COUNT_FIELDS:
+            if hasattr(instance, field):
+                data[field] = getattr(instance, field)
+        return data
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     """Создание пользователя"""
@@ -102,7 +119,7 @@ class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор Ингредиенты"""
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
@@ -128,6 +145,10 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    calories = serializers.FloatField(source='nutrition.calories',
+                                      read_only=True)
+    price = serializers.DecimalField(source='nutrition.price', max_digits=12,
+                                     decimal_places=2, read_only=True)
 
     class Meta:
         model = Recipe
@@ -142,8 +163,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             'image',
             'text',
             'cooking_time',
+            'calories',
+            'price',
         ]
 
+    def to_representation(self, instance):
+        """Состав рецепта читается одним запросом вместе с ингредиентами."""
+        prefetch_related_objects([instance], Prefetch(
+            'ingredientrecipe_set',
+            queryset=IngredientRecipe.objects.select_related('ingredient')))
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
         """Проверка наличия рецепта в избранном"""
         user = self.context.get('request').user
@@ -160,35 +190,35 @@ class RecipeSerializer(serializers.ModelSerializer):
         return obj.shoppingcart.filter(user=user).exists()
 
     def validate_ingredients(self, ingredients):
-        """Валидация ингредиентов"""
-        ingredients_result = []
-        ingredient_ids = set()
+        """Валидация ингредиентов.
+        Ингредиенты проверяются одним запросом на весь рецепт.
+        """
+        ingredient_ids = []
 
         for ingredient_item in ingredients:
             ingredient_id = ingredient_item.get('id')
-            amount = ingredient_item.get('amount')
 
             if not ingredient_id:
                 raise serializers.ValidationError(NOT_ID_INGREDIENTS)
             if ingredient_id in ingredient_ids:
                 raise serializers.ValidationError(INGREDIENT_ALREADY_ADDED)
-            ingredient_ids.add(ingredient_id)
+            ingredient_ids.append(ingredient_id)
 
-            try:
-                ingredient = Ingredient.objects.get(id=ingredient_id)
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    INGREDIENT_WITH_THIS_ID_NOT_EXISTS)
             if not (
                 isinstance(ingredient_item['amount'], int)
                 or ingredient_item['amount'].isdigit()
             ):
                 raise serializers.ValidationError(
                     INGREDIENT_AMOUNT_FORMAT_ERROR)
-            ingredients_result.append(
-                {'ingredients': ingredient,
-                 'amount': amount})
-        return ingredients_result
+
+        found = self.fetch_by_ids(Ingredient, ingredient_ids,
+                                  INGREDIENT_WITH_THIS_ID_NOT_EXISTS)
+        return [
+            {'ingredients': found[ingredient_id],
+             'amount': ingredient_item.get('amount')}
+            for ingredient_id, ingredient_item in zip(ingredient_ids,
+                                                      ingredients)
+        ]
 
     def validate_tags(self, tags_data):
         """Валидация тегов"""
@@ -196,14 +226,22 @@ class RecipeSerializer(serializers.ModelSerializer):
         for tag_id in tags_data:
             if tag_id in tag_list:
                 raise serializers.ValidationError(TAG_ALREADY_ADDED)
-            try:
-                Tag.objects.get(id=tag_id)
-            except Tag.DoesNotExist:
-                raise serializers.ValidationError(TAG_WITH_THIS_ID_NOT_EXISTS)
             tag_list.append(tag_id)
-
+        self.fetch_by_ids(Tag, tag_list, TAG_WITH_THIS_ID_NOT_EXISTS)
         return tag_list
 
+    @staticmethod
+    def fetch_by_ids(model, ids, error):
+        """Объекты по списку id одним запросом: {id из запроса: объект}."""
+        try:
+            keys = [int(obj_id) for obj_id in ids]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(error)
+        found = model.objects.in_bulk(keys)
+        if len(found) != len(set(keys)):
+            raise serializers.ValidationError(error)
+        return {obj_id: found[key] for obj_id, key in zip(ids, keys)}
+
     def validate(self, data):
         """Метод для валидации данных перед созданием рецепта"""
         ingredients = self.initial_data.get('ingredients')
@@ -232,6 +270,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients
         ])
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта"""
         image = validated_data.pop('image')
@@ -241,8 +280,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.create_ingredients(ingredients_data, recipe)
         tags = Tag.objects.filter(id__in=tags_data)
         recipe.tags.add(*tags)
+        refresh_recipes_now([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Обновление рецепта"""
         instance.tags.clear()
@@ -251,6 +292,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         instance.ingredients.clear()
         ingredients_data = validated_data.pop('ingredients', [])
         self.create_ingredients(ingredients_data, instance)
+        refresh_recipes_now([instance.pk])
         return super().update(instance, validated_data)
 
 
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from recipes.commit_hooks import on_commit_once, transaction_hook
+
+calls = []
+
+
+class Pending(set):
+    def __call__(self):
+        calls.append(sorted(self))
+
+
+def add(value):
+    transaction_hook(Pending).add(value)
+
+
+class Rollback(Exception):
+    pass
+
+
+class TransactionHookTest(TransactionTestCase):
+    """Один хук на транзакцию; откат выбрасывает его вместе с данными."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_one_hook_per_transaction(self):
+        with transaction.atomic():
+            add(1)
+            with transaction.atomic():
+                add(2)
+        self.assertEqual(calls, [[1, 2]])
+        with transaction.atomic():
+            add(3)
+        self.assertEqual(calls, [[1, 2], [3]])
+
+    def test_hook_registered_in_rolled_back_savepoint(self):
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    add(1)
+                    raise Rollback
+            except Rollback:
+                pass
+            add(2)
+        self.assertEqual(calls, [[2]])
+
+    def test_rollback(self):
+        try:
+            with transaction.atomic():
+                add(1)
+                raise Rollback
+        except Rollback:
+            pass
+        with transaction.atomic():
+            add(2)
+        self.assertEqual(calls, [[2]])
+
+    def test_new_transaction_in_commit_hook(self):
+        """Хук, открывающий транзакцию после коммита, получает новый набор."""
+        def nested():
+            with transaction.atomic():
+                add(2)
+
+        with transaction.atomic():
+            on_commit_once(nested)
+            add(1)
+        self.assertCountEqual(calls, [[1], [2]])
+
+    def test_on_commit_once(self):
+        self.assertIsNone(transaction_hook(Pending))
+        on_commit_once(lambda: calls.append('now'))
+        with transaction.atomic():
+            for _ in range(3):
+                on_commit_once(test_func)
+        self.assertEqual(calls, ['now', 'once'])
+
+
+def test_func():
+    calls.append('once')
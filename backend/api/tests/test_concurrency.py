@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Follow, Recipe, RecipeScore,
+                            ShoppingList)
+from recipes.scores import RECIPE_LIST_WEIGHTS
+
+User = get_user_model()
+
+THREADS = 8
+
+
+class ConcurrentListActionsTest(TransactionTestCase):
+    """Параллельные одинаковые запросы на добавление и удаление:
+    ровно один успешный ответ и одна строка, без ответов 500.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='user@example.com',
+                                        username='user')
+        self.author = User.objects.create(email='author@example.com',
+                                          username='author')
+        self.recipe = Recipe.objects.create(author=self.author, name='Суп',
+                                            text='Суп', cooking_time=10)
+
+    def send_parallel(self, method, path, data=None):
+        return sorted(response.status_code for response in
+                      self.send_parallel_responses(method, path, data))
+
+    def send_parallel_responses(self, method, path, data=None):
+        def send(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                return getattr(client, method)(path, data, format='json')
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            return list(pool.map(send, range(THREADS)))
+
+    def assert_race_free(self, path, queryset, data=None):
+        statuses = self.send_parallel('post', path, data)
+        self.assertEqual(statuses, [201] + [400] * (THREADS - 1))
+        self.assertEqual(queryset.count(), 1)
+
+        statuses = self.send_parallel('delete', path, data)
+        self.assertEqual(statuses, [204] + [400] * (THREADS - 1))
+        self.assertEqual(queryset.count(), 0)
+
+    def test_favorite(self):
+        self.assert_race_free(
+            reverse('api:favorite', kwargs={'id': self.recipe.id}),
+            FavoriteRecipe.objects.filter(user=self.user))
+
+    def test_shopping_cart(self):
+        self.assert_race_free(
+            reverse('api:shopping_cart', kwargs={'id': self.recipe.id}),
+            ShoppingList.objects.filter(user=self.user))
+
+    def test_subscribe(self):
+        self.assert_race_free(
+            reverse('api:subscribe', kwargs={'id': self.author.id}),
+            Follow.objects.filter(user=self.user))
+
+    def test_create_subscription(self):
+        statuses = self.send_parallel(
+            'post', reverse('api:customuser-create-subscription'),
+            {'author_id': self.author.id})
+        self.assertEqual(statuses, [201] + [400] * (THREADS - 1))
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_favorite(self):
+        """added получает ровно один запрос, рейтинг растёт один раз."""
+        responses = self.send_parallel_responses(
+            'post', reverse('api:favorite_bulk'),
+            {'recipes': [self.recipe.id]})
+        statuses = sorted(response.data['results'][0]['status']
+                          for response in responses)
+        self.assertEqual(statuses,
+                         ['added'] + ['already_added'] * (THREADS - 1))
+        self.assertEqual(
+            RecipeScore.objects.get(recipe=self.recipe).popular,
+            RECIPE_LIST_WEIGHTS['favoriterecipe'])
+
+        responses = self.send_parallel_responses(
+            'delete', reverse('api:favorite_bulk'),
+            {'recipes': [self.recipe.id]})
+        statuses = sorted(response.data['results'][0]['status']
+                          for response in responses)
+        self.assertEqual(statuses,
+                         ['not_in_list'] * (THREADS - 1) + ['removed'])
+        self.assertEqual(
+            RecipeScore.objects.get(recipe=self.recipe).popular, 0)
+
+    def test_bulk_ids_validation(self):
+        """Дробные, логические и вне диапазона bigint id — 400, не 500."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for ids in ([1.9], ['1.9'], [True], [2 ** 63], [str(-2 ** 63 - 1)]):
+            response = client.post(reverse('api:favorite_bulk'),
+                                   {'recipes': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+        response = client.post(reverse('api:favorite_bulk'),
+                               {'recipes': [str(self.recipe.id)]},
+                               format='json')
+        self.assertEqual(response.data['results'],
+                         [{'id': self.recipe.id, 'status': 'added'}])
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.views import CustomUserViewSet, IngredientViewSet, RecipeViewSet
+from recipes.changes import publish_changes
+from recipes.models import (FavoriteRecipe, Follow, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingList, Tag)
+
+User = get_user_model()
+
+SIZES = (1, 6)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_INDEX_ENABLED=False)
+class QueryBudgetTest(TestCase):
+    """Число запросов маршрутов не больше бюджета вьюсета (query_budgets)
+    и не растёт с размером страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com',
+                                       username='user')
+        cls.authors = [
+            User.objects.create(email=f'author{number}@example.com',
+                                username=f'author{number}')
+            for number in range(max(SIZES))
+        ]
+        tags = [Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}',
+                                   color=f'#00000{number}')
+                for number in range(2)]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(max(SIZES))
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            for number in range(max(SIZES)):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}', text='Текст',
+                    cooking_time=10)
+                recipe.tags.set(tags)
+                IngredientRecipe.objects.bulk_create(
+                    IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                     amount=1)
+                    for ingredient in ingredients)
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+                ShoppingList.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = Recipe.objects.order_by('id').first()
+        publish_changes()
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def count_queries(self, path, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, path)
+        return len(context)
+
+    def assert_budget(self, viewset, action, path, params=None):
+        counts = [self.count_queries(path, {**(params or {}), 'limit': size,
+                                            'recipes_limit': size})
+                  for size in SIZES]
+        self.assertLessEqual(max(counts), viewset.query_budgets[action],
+                             f'{path}: {counts}')
+        self.assertLessEqual(counts[-1], counts[0],
+                             f'{path}: число запросов растёт с размером')
+
+    def test_recipe_list(self):
+        self.assert_budget(RecipeViewSet, 'list', reverse('api:recipe-list'))
+
+    def test_recipe_list_filtered(self):
+        self.assert_budget(RecipeViewSet, 'list', reverse('api:recipe-list'),
+                           {'is_favorited': 1, 'tags': 'tag0',
+                            'author': self.authors[0].pk})
+
+    def test_recipe_retrieve(self):
+        self.assert_budget(RecipeViewSet, 'retrieve', reverse(
+            'api:recipe-detail', kwargs={'pk': self.recipe.pk}))
+
+    def test_recipe_changes(self):
+        self.assert_budget(RecipeViewSet, 'changes',
+                           reverse('api:recipe-changes'), {'since': 0})
+
+    def test_user_list(self):
+        self.assert_budget(CustomUserViewSet, 'list',
+                           reverse('api:customuser-list'))
+
+    def test_subscriptions(self):
+        self.assert_budget(CustomUserViewSet, 'subscriptions',
+                           reverse('api:customuser-subscriptions'))
+
+    def test_ingredient_list(self):
+        self.assert_budget(IngredientViewSet, 'list',
+                           reverse('api:ingredient-list'))
+
+    def test_all_routes(self):
+        """Все маршруты, включая запись и хуки после коммита."""
+        call_command('check_query_budgets', sizes='1,6', skip_checks=False,
+                     stdout=StringIO())
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import recipe_index
+from api.recipe_index import build_index, get_index
+from recipes.models import Recipe, Tag
+from recipes.signals import recipes_version
+
+User = get_user_model()
+
+
+def reset_state():
+    recipe_index._state.update(index=None, version=None, checked_at=None)
+
+
+def create_recipes(authors, tags, count):
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[number % len(authors)], name=f'Рецепт {number}',
+            text='Текст', cooking_time=10,
+            image=f'recipes/images/{number}.png' if number % 2 else '')
+        recipe.tags.set(tags[:number % len(tags) + 1][-1:])
+
+
+@override_settings(RECIPE_INDEX_ENABLED=False)
+class RecipeIndexTest(TestCase):
+    """Выдача из индекса совпадает с ORM байт в байт, а запросы,
+    которые индекс не умеет, уходят в ORM.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create(email=f'author{number}@example.com',
+                                username=f'author{number}')
+            for number in range(2)
+        ]
+        cls.tags = [Tag.objects.create(name=f'Тег {number}',
+                                       slug=f'tag{number}',
+                                       color=f'#00000{number}')
+                    for number in range(3)]
+        create_recipes(cls.authors, cls.tags[:2], 9)
+
+    def setUp(self):
+        self.index = build_index(1)
+        self.path = reverse('api:recipe-list')
+
+    def request(self, params=None):
+        return Request(APIRequestFactory().get(self.path, params or {}))
+
+    def test_parse_fallbacks(self):
+        for params in ({'is_favorited': 1}, {'tags': 'unknown'},
+                       {'tags': 'tag2'}, {'author': 'x'},
+                       {'author': 10 ** 6}, {'page': 'x'}, {'page': 0},
+                       {'page': 100}):
+            self.assertIsNone(self.index.page(self.request(params)), params)
+
+    def test_filters(self):
+        author = self.authors[0].pk
+        parsed = self.index.parse(self.request(
+            {'tags': ['tag0', 'tag1'], 'author': author, 'limit': 2}))
+        self.assertEqual(parsed, (0b11, author, 1, 2))
+        positions = self.index.positions(self.index.tag_bits['tag0'], author)
+        self.assertEqual(
+            [self.index.ids[position] for position in positions],
+            list(Recipe.objects.filter(author=author, tags__slug='tag0')
+                 .order_by('-pub_date', '-id').values_list('id', flat=True)))
+
+    def test_links(self):
+        body = self.index.page(self.request({'limit': 4}))
+        self.assertIn(b'"next":"http://testserver/api/recipes/?limit=4'
+                      b'&page=2"', body)
+        self.assertIn(b'"previous":null', body)
+        body = self.index.page(self.request({'limit': 4, 'page': 3}))
+        self.assertIn(b'"next":null', body)
+        self.assertIn(b'"previous":"http://testserver/api/recipes/?limit=4'
+                      b'&page=2"', body)
+        body = self.index.page(self.request({'limit': 4, 'page': 2}))
+        self.assertIn(b'"previous":"http://testserver/api/recipes/?limit=4"',
+                      body)
+
+    def test_same_bytes_as_orm(self):
+        client = APIClient()
+        for params in ({}, {'tags': 'tag0'}, {'tags': ['tag0', 'tag1']},
+                       {'author': self.authors[1].pk},
+                       {'limit': 4, 'page': 2}):
+            response = client.get(self.path, params)
+            self.assertEqual(self.index.page(self.request(params)),
+                             response.content, params)
+
+    def test_max_bytes(self):
+        self.assertLess(self.index.size, 10 ** 6)
+        with override_settings(RECIPE_INDEX_MAX_BYTES=self.index.size - 1):
+            self.assertIsNone(build_index(1))
+        with override_settings(RECIPE_INDEX_MAX_BYTES=self.index.size):
+            self.assertIsNotNone(build_index(1))
+
+
+@override_settings(RECIPE_INDEX_ENABLED=True, RECIPE_INDEX_POLL_SECONDS=0)
+class RecipeIndexRebuildTest(TransactionTestCase):
+    """Смена версии рецептов перестраивает индекс в фоне."""
+
+    def setUp(self):
+        reset_state()
+        self.addCleanup(reset_state)
+        self.author = User.objects.create(email='author@example.com',
+                                          username='author')
+        self.tag = Tag.objects.create(name='Тег', slug='tag',
+                                      color='#000000')
+
+    def wait_rebuild(self):
+        """get_index запускает перестройку; ждём, пока поток отпустит
+        блокировку.
+        """
+        get_index()
+        self.assertTrue(recipe_index._lock.acquire(timeout=5))
+        recipe_index._lock.release()
+        return get_index()
+
+    def test_rebuild_on_version_change(self):
+        create_recipes([self.author], [self.tag], 1)
+        index = self.wait_rebuild()
+        self.assertEqual(index.version, recipes_version())
+        self.assertEqual(len(index.ids), 1)
+
+        create_recipes([self.author], [self.tag], 1)
+        new_index = self.wait_rebuild()
+        self.assertIsNot(new_index, index)
+        self.assertEqual(new_index.version, recipes_version())
+        self.assertEqual(len(new_index.ids), 2)
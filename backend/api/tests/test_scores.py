@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import AuthorScore, Follow, Recipe, RecipeScore
+from recipes.scores import (AUTHOR_LIST_WEIGHTS, record_list_change,
+                            refresh_scores)
+
+User = get_user_model()
+
+
+class AuthorScoreTest(TestCase):
+    """Подписка меняет одну строку автора, рецепты — при пересчёте."""
+
+    def setUp(self):
+        self.author = User.objects.create(email='author@example.com',
+                                          username='author')
+        for number in range(3):
+            Recipe.objects.create(author=self.author, name=f'Суп {number}',
+                                  text='Суп', cooking_time=10)
+
+    def test_follow_is_applied_on_refresh(self):
+        follower = User.objects.create(email='user@example.com',
+                                       username='user')
+        Follow.objects.create(user=follower, author=self.author)
+        with CaptureQueriesContext(connection) as context:
+            record_list_change(Follow, [self.author.id])
+            record_list_change(Follow, [self.author.id])
+        self.assertEqual(len(context), 2)
+        self.assertEqual(
+            AuthorScore.objects.get(author=self.author).pending_trending,
+            2 * AUTHOR_LIST_WEIGHTS['follow'])
+        self.assertFalse(RecipeScore.objects.exclude(trending=0).exists())
+
+        refresh_scores()
+        weight = AUTHOR_LIST_WEIGHTS['follow']
+        self.assertEqual(
+            set(RecipeScore.objects.values_list('popular', 'trending')),
+            {(weight, 2 * weight)})
+        self.assertEqual(
+            AuthorScore.objects.get(author=self.author).pending_trending, 0)
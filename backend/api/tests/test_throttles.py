@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from api.throttles import (AnonWindowThrottle, ExportThrottle,
+                           UserWindowThrottle)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000 * 60.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_request(ip='10.0.0.1', user=None, forwarded=None):
+    meta = {'REMOTE_ADDR': '172.18.0.2'}
+    meta['HTTP_X_FORWARDED_FOR'] = forwarded or ip
+    return SimpleNamespace(user=user or AnonymousUser(), META=meta)
+
+
+class SlidingWindowThrottleTest(SimpleTestCase):
+    """Всплеск до лимита, восстановление со временем, ключи по scope."""
+
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock()
+
+    def throttle(self, throttle_class, rate='3/min'):
+        throttle = throttle_class()
+        throttle.rate = rate
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        throttle.timer = self.clock
+        return throttle
+
+    def allowed(self, throttle_class, request, count):
+        return [self.throttle(throttle_class).allow_request(request, None)
+                for _ in range(count)]
+
+    def test_burst(self):
+        request = make_request()
+        self.assertEqual(self.allowed(AnonWindowThrottle, request, 4),
+                         [True, True, True, False])
+        throttle = self.throttle(AnonWindowThrottle)
+        self.assertFalse(throttle.allow_request(request, None))
+        self.assertGreater(throttle.wait(), 0)
+        self.assertLessEqual(throttle.wait(), 60)
+
+    def test_refill(self):
+        request = make_request()
+        self.allowed(AnonWindowThrottle, request, 3)
+        # Половина прошлого окна ещё в скользящем: 3 * 0.5 + 1 <= 3.
+        self.clock.now += 90
+        self.assertEqual(self.allowed(AnonWindowThrottle, request, 2),
+                         [True, False])
+        self.clock.now += 120
+        self.assertEqual(self.allowed(AnonWindowThrottle, request, 4),
+                         [True, True, True, False])
+
+    def test_rejected_requests_do_not_use_quota(self):
+        request = make_request()
+        self.allowed(AnonWindowThrottle, request, 10)
+        self.clock.now += 60
+        self.assertEqual(self.allowed(AnonWindowThrottle, request, 1),
+                         [False])
+        self.clock.now += 30
+        self.assertEqual(self.allowed(AnonWindowThrottle, request, 2),
+                         [True, False])
+
+    def test_keys_per_scope_and_client(self):
+        user = SimpleNamespace(is_authenticated=True, pk=1)
+        anon = self.throttle(AnonWindowThrottle)
+        export = self.throttle(ExportThrottle)
+        user_throttle = self.throttle(UserWindowThrottle)
+        request = make_request()
+        self.assertNotEqual(anon.get_cache_key(request, None),
+                            export.get_cache_key(request, None))
+        self.assertIsNone(anon.get_cache_key(make_request(user=user), None))
+        self.assertIsNone(user_throttle.get_cache_key(request, None))
+
+        self.allowed(AnonWindowThrottle, request, 3)
+        self.assertEqual(self.allowed(ExportThrottle, request, 1), [True])
+        self.assertEqual(
+            self.allowed(AnonWindowThrottle, make_request('10.0.0.2'), 1),
+            [True])
+
+    def test_forwarded_for_from_client_is_ignored(self):
+        """nginx дописывает адрес клиента последним (NUM_PROXIES=1)."""
+        throttle = self.throttle(AnonWindowThrottle)
+        spoofed = make_request(forwarded='1.2.3.4, 10.0.0.1')
+        self.assertEqual(throttle.get_cache_key(spoofed, None),
+                         throttle.get_cache_key(make_request(), None))
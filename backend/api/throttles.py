@@ -0,0 +1,93 @@
+"""Ограничение частоты запросов скользящим окном.
+
+Для каждого клиента в кеше хранятся два счётчика: текущего и прошлого
+окна длиной duration. Оценка числа запросов за последние duration
+секунд — счётчик текущего окна плюс счётчик прошлого, взвешенный долей,
+которая ещё попадает в скользящее окно. Счётчик растёт атомарным
+cache.incr, поэтому блокировки не нужны: обычная проверка — два
+обращения к кешу (incr и get). Чтобы лимит был общим для всех воркеров,
+нужен общий кеш (CACHE_BACKEND=memcached), иначе gunicorn с несколькими
+воркерами не запустится (gunicorn.conf.py).
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Не больше num_requests запросов за любые duration секунд
+    (с точностью оценки по двум окнам).
+    """
+    wait_time = None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        window, elapsed = divmod(now, self.duration)
+        current_key = f'{self.key}:{int(window)}'
+        count = self.increment(current_key)
+        previous = self.cache.get(f'{self.key}:{int(window) - 1}', 0)
+        weight = 1 - elapsed / self.duration
+        estimate = previous * weight + count
+        if estimate <= self.num_requests:
+            return True
+        # Отказ не расходует лимит.
+        self.cache.decr(current_key)
+        left = self.duration - elapsed
+        if previous:
+            left = min(left, (estimate - self.num_requests)
+                       * self.duration / previous)
+        self.wait_time = left
+        return False
+
+    def increment(self, key):
+        """cache.incr атомарен и в memcached, и в LocMemCache; счётчик
+        живёт два окна, чтобы его можно было прочитать как прошлый.
+        """
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, 2 * self.duration)
+            return self.cache.incr(key)
+
+    def wait(self):
+        return self.wait_time
+
+
+class AnonWindowThrottle(SlidingWindowThrottle):
+    """Анонимные пользователи, по IP."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class UserWindowThrottle(SlidingWindowThrottle):
+    """Авторизованные пользователи, по id."""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        return super().get_cache_key(request, view)
+
+
+class ExportThrottle(SlidingWindowThrottle):
+    """Выгрузка списка покупок."""
+    scope = 'export'
+
+
+class RecipeCreateThrottle(SlidingWindowThrottle):
+    """Создание рецепта с загрузкой картинки."""
+    scope = 'recipe_create'
@@ -34,4 +34,22 @@ urlpatterns = [
          ShoppingViewSet.as_view({'post': 'create', 'delete': 'delete'}),
          name='shopping_cart',
          ),
+
+    path('recipes/favorite/bulk/',
+         FavoriteRecipeViewSet.as_view({'post': 'create_bulk',
+                                        'delete': 'delete_bulk'}),
+         name='favorite_bulk',
+         ),
+
+    path('users/subscribe/bulk/',
+         FollowViewSet.as_view({'post': 'create_bulk',
+                                'delete': 'delete_bulk'}),
+         name='subscribe_bulk',
+         ),
+
+    path('recipes/shopping_cart/bulk/',
+         ShoppingViewSet.as_view({'post': 'create_bulk',
+                                  'delete': 'delete_bulk'}),
+         name='shopping_cart_bulk',
+         ),
 ]
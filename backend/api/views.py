@@ -1,5 +1,9 @@
-from django.db.models import Sum
-from django.http import Http404, HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import (Exists, ExpressionWrapper, F, IntegerField,
+                              OuterRef, Sum)
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
@@ -9,7 +13,9 @@ from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from djoser.views import UserViewSet
 
-from api.constants import (AUTHOR_NOT_FOUND_ERROR,
+from api.change_feed import CHANGES_MAX_QUERIES, change_lines
+from api.constants import (AUTHOR_NOT_FOUND_ERROR, CHANGES_SINCE_ERROR,
+                           INGREDIENT_SNAPSHOT_NOT_FOUND_ERROR,
                            RECIPE_ALREADY_ADDED_ERROR,
                            RECIPE_ALREADY_ADDED_IN_CARD,
                            RECIPE_NOT_IN_FAVORITES_ERROR,
@@ -17,59 +23,97 @@ from api.constants import (AUTHOR_NOT_FOUND_ERROR,
                            SUBSCRIPTION_ALREADY_EXISTS_ERROR,
                            SUBSCRIPTION_NOT_FOUND_ERROR,
                            SUBSCRIPTION_SELF_ERROR)
-from api.mixins import RecipeActionMixin
-from api.filters import IngredientFilter, RecipeFilter
-from api.paginations import CustomPagination
+from api.mixins import (BulkActionMixin, RecipeActionMixin,
+                        is_unique_violation)
+from api.filters import IngredientFilter, RecipeFilter, UserFilter
+from api.paginations import CustomPagination, UserListPagination
 from api.permissions import IsOwnerOrReadOnly
+from api.queries import QueryBudgetMixin
+from api.recipe_index import serve_from_index
+from api.read_serializers import (USER_LIST_FIELDS, follow_rows,
+                                  recipe_rows, related_by_recipe,
+                                  serialize_follows, serialize_recipe,
+                                  serialize_recipes, serialize_user_list)
 from api.serializers import (FollowSerializer, IngredientSerializer,
                              FavoriteRecipeSerializer, RecipeSerializer,
                              ShoppingListSerializer, TagSerializer)
+from api.throttles import ExportThrottle, RecipeCreateThrottle
 from recipes.models import (Follow, Ingredient, IngredientRecipe, Recipe,
                             FavoriteRecipe, ShoppingList, Tag)
+from recipes.recommendations import recommended_recipes
+from recipes.scores import count_of, record_list_change
+from recipes.snapshots import get_snapshot_data, read_manifest
 from users.models import CustomUser
 
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(QueryBudgetMixin, UserViewSet):
     """ViewSet для модели пользователя
     """
     permission_classes = [IsOwnerOrReadOnly]
     pagination_class = CustomPagination
+    filterset_class = UserFilter
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+        'me': 2,
+        'subscriptions': 4,
+        'create_subscription': 9,
+        'favorites': 2,
+        'shopping_cart': 2,
+    }
+
+    def get_queryset(self):
+        """Флаг подписки и, по запросу, счётчики считаются в том же
+        запросе, что и страница пользователей.
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('pk'))))
+        if self.request.query_params.get('with_counts') in ('1', 'true'):
+            queryset = queryset.annotate(
+                recipes_count=count_of(Recipe.objects, 'author', 'pk'),
+                followers_count=count_of(Follow.objects, 'author', 'pk'),
+            )
+        return queryset
 
     @action(detail=False,
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         """Просмотр подписок пользователя"""
-        queryset = self.request.user.follower.all()
+        queryset = follow_rows(self.request.user.follower.all())
         page = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(page,
-                                      many=True,
-                                      context={'request': request})
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(serialize_follows(page, request))
 
     @action(detail=False, methods=['post'],
             permission_classes=[IsAuthenticated])
     def create_subscription(self, request):
         """Создание подписки"""
-        author_id = request.data.get('author_id')
+        try:
+            author_id = int(request.data.get('author_id'))
+        except (TypeError, ValueError):
+            raise Http404(AUTHOR_NOT_FOUND_ERROR)
+        author = get_object_or_404(CustomUser, id=author_id)
 
-        if author_id == request.user.id:
+        if author == request.user:
             return Response(SUBSCRIPTION_SELF_ERROR,
                             status=status.HTTP_400_BAD_REQUEST)
-
-        if Follow.objects.filter(user=request.user,
-                                 author_id=author_id
-                                 ).exists():
+        try:
+            with transaction.atomic():
+                subscribe = Follow.objects.create(user=request.user,
+                                                  author=author)
+        except IntegrityError as error:
+            if not is_unique_violation(error, Follow):
+                raise
             return Response(SUBSCRIPTION_ALREADY_EXISTS_ERROR,
                             status=status.HTTP_400_BAD_REQUEST)
-
-        serializer = FollowSerializer(
-            data={'author': author_id, 'user': request.user.id})
-
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        record_list_change(Follow, [author.id])
+        serializer = FollowSerializer(subscribe, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(['get', 'put'], detail=False,
@@ -79,8 +123,29 @@ class CustomUserViewSet(UserViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
+    def user_list_response(self, model):
+        """Страница рецептов из списка пользователя, новые сверху."""
+        paginator = UserListPagination()
+        queryset = model.objects.filter(
+            user=self.request.user).values(*USER_LIST_FIELDS)
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        return paginator.get_paginated_response(
+            serialize_user_list(page, self.request))
+
+    @action(detail=False, url_path='me/favorites',
+            permission_classes=[IsAuthenticated])
+    def favorites(self, request):
+        """Избранные рецепты текущего пользователя."""
+        return self.user_list_response(FavoriteRecipe)
+
+    @action(detail=False, url_path='me/shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart(self, request):
+        """Рецепты в списке покупок текущего пользователя."""
+        return self.user_list_response(ShoppingList)
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для модели Тег
     Получение списка тегов /
     конкретного тега
@@ -89,9 +154,13 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    query_budgets = {
+        'list': 2,
+        'retrieve': 2,
+    }
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для модели Ингредиенты
     Получение списка ингредиентов /
     конкретного ингредиента
@@ -102,9 +171,31 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
-
-
-class RecipeViewSet(viewsets.ModelViewSet):
+    query_budgets = {
+        'list': 2,
+        'retrieve': 2,
+        'snapshot': 1,
+    }
+
+    def list(self, request, *args, **kwargs):
+        """Без фильтров каталог отдаётся из опубликованного снимка"""
+        if not request.query_params.get('name'):
+            data = get_snapshot_data()
+            if data is not None:
+                return Response(data)
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False)
+    def snapshot(self, request):
+        """Версия и адрес снимка каталога для загрузки на клиенте"""
+        manifest = read_manifest()
+        if manifest is None:
+            return Response(INGREDIENT_SNAPSHOT_NOT_FOUND_ERROR,
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(manifest)
+
+
+class RecipeViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     """ViewSet Рецепт
     Получение списка рецептов /
     конкретного рецепта /
@@ -117,10 +208,97 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = [IsOwnerOrReadOnly]
+    action_throttles = {
+        'create': RecipeCreateThrottle,
+        'download_shopping_cart': ExportThrottle,
+    }
+    query_budgets = {
+        # Фильтры tags и author проверяют значения ещё двумя запросами.
+        'list': 6,
+        # Токен, строка рецепта и без кеша — теги с ингредиентами.
+        'retrieve': 3,
+        'create': 27,
+        'update': 32,
+        'partial_update': 32,
+        'destroy': 24,
+        'recommended': 6,
+        'changes': CHANGES_MAX_QUERIES,
+        'download_shopping_cart': 2,
+    }
+
+    def get_throttles(self):
+        throttles = super().get_throttles()
+        if self.action in self.action_throttles:
+            throttles.append(self.action_throttles[self.action]())
+        return throttles
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов через облегчённые сериализаторы чтения.
+        Анонимным пользователям отвечает индекс в памяти, если включён.
+        """
+        if (not request.user.is_authenticated
+                and request.accepted_renderer.format == 'json'):
+            body = serve_from_index(request)
+            if body is not None:
+                return HttpResponse(body, content_type='application/json')
+        queryset = recipe_rows(self.filter_queryset(self.get_queryset()),
+                               request.user)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serialize_recipes(page, request))
+        return Response(serialize_recipes(queryset, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Карточка рецепта. Строка рецепта с автором и флагами
+        пользователя читается одним запросом, теги и ингредиенты —
+        из кеша по ключу с версией рецепта (recipe.version растёт
+        при каждом изменении), а без кеша ещё одним запросом.
+        """
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        row = recipe_rows(
+            self.filter_queryset(self.get_queryset()).filter(pk=pk),
+            request.user).first()
+        if row is None:
+            raise Http404
+        key = f'recipe:{pk}:{row["version"]}'
+        related = cache.get(key)
+        if related is None:
+            tags, ingredients = related_by_recipe([pk])
+            related = {'tags': tags.get(pk, []),
+                       'ingredients': ingredients.get(pk, [])}
+            cache.set(key, related, settings.RECIPE_DETAIL_CACHE_TIMEOUT)
+        return Response(serialize_recipe(row, related['tags'],
+                                         related['ingredients'], request))
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(methods=['GET'],
+            detail=False,
+            permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        """Рецепты, похожие на избранное пользователя."""
+        queryset = recipe_rows(recommended_recipes(request.user),
+                               request.user)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize_recipes(page, request))
+
+    @action(methods=['GET'],
+            detail=False,
+            permission_classes=[AllowAny])
+    def changes(self, request):
+        """Изменения рецептов после записи журнала since (NDJSON)."""
+        since = request.query_params.get('since', '0')
+        if not since.isdigit():
+            return Response(CHANGES_SINCE_ERROR,
+                            status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(change_lines(int(since), request),
+                                     content_type='application/x-ndjson')
+
     @action(methods=['GET'],
             detail=False,
             permission_classes=[IsAuthenticated])
@@ -128,43 +306,43 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Скачивание списка покупок для выбранных
         рецептов данные суммируются.
         """
-        shopping_result = {}
-        shopping_list_recipes = Recipe.objects.filter(
-            shoppingcart__user=request.user)
         ingredients = IngredientRecipe.objects.filter(
-            recipe__in=shopping_list_recipes
-        ).values('ingredient__name',
-                 'ingredient__measurement_unit'
-                 ).annotate(
-            total_amount=Sum('amount')
-        )
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            total_amount = ingredient['total_amount']
-
-            shopping_result[name] = {
-                "measurement_unit": measurement_unit,
-                "amount": total_amount,
-            }
+            recipe__shoppingcart__user=request.user
+        ).values(
+            'ingredient__name', 'ingredient__canonical_unit'
+        ).annotate(
+            total_amount=Sum(ExpressionWrapper(
+                F('amount') * F('ingredient__unit_factor'),
+                output_field=IntegerField()))
+        ).order_by('ingredient__name', 'ingredient__canonical_unit')
 
         response = HttpResponse((
-            f"{name} - {value['amount']} {value['measurement_unit']}\n"
-            for name, value in shopping_result.items()
+            f"{ingredient['ingredient__name']} - "
+            f"{ingredient['total_amount']} "
+            f"{ingredient['ingredient__canonical_unit']}\n"
+            for ingredient in ingredients.iterator()
         ), content_type="text/plain")
         response[
             'Content-Disposition'] = 'attachment; filename="shoppinglist.txt"'
         return response
 
 
-class FollowViewSet(viewsets.ModelViewSet):
+class FollowViewSet(QueryBudgetMixin, BulkActionMixin,
+                    viewsets.ModelViewSet):
     """ViewSet для подписки
     Cоздание подписки /
-    удаление подписки
+    удаление подписки /
+    пакетные подписка и отписка
     """
     serializer_class = FollowSerializer
     pagination_class = CustomPagination
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'create': 9,
+        'delete': 3,
+        'create_bulk': 4,
+        'delete_bulk': 4,
+    }
 
     def create(self, request, *args, **kwargs):
         """Создание подписки"""
@@ -174,12 +352,17 @@ class FollowViewSet(viewsets.ModelViewSet):
         if user == request.user:
             return Response(SUBSCRIPTION_SELF_ERROR,
                             status=status.HTTP_400_BAD_REQUEST)
-        if Follow.objects.filter(user=request.user, author=user).exists():
+        try:
+            with transaction.atomic():
+                subscribe = Follow.objects.create(user=request.user,
+                                                  author=user)
+        except IntegrityError as error:
+            if not is_unique_violation(error, Follow):
+                raise
             return Response(
                 SUBSCRIPTION_ALREADY_EXISTS_ERROR,
                 status=status.HTTP_400_BAD_REQUEST)
-
-        subscribe = Follow.objects.create(user=request.user, author=user)
+        record_list_change(Follow, [user.id])
 
         serializer = FollowSerializer(subscribe, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -187,31 +370,55 @@ class FollowViewSet(viewsets.ModelViewSet):
     def delete(self, request, *args, **kwargs):
         """Удаление подписки"""
         author_id = self.kwargs['id']
-        user_id = request.user.id
-        try:
-            CustomUser.objects.get(id=author_id)
-        except CustomUser.DoesNotExist:
+        deleted, _ = Follow.objects.filter(
+            user=request.user,
+            author_id=author_id).delete()
+        if deleted:
+            record_list_change(Follow, [author_id], added=False)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not CustomUser.objects.filter(id=author_id).exists():
             raise Http404(AUTHOR_NOT_FOUND_ERROR)
-        try:
-            subscription = Follow.objects.get(
-                user_id=user_id,
-                author_id=author_id)
-        except Follow.DoesNotExist:
-            return Response(
-                SUBSCRIPTION_NOT_FOUND_ERROR,
-                status=status.HTTP_400_BAD_REQUEST)
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            SUBSCRIPTION_NOT_FOUND_ERROR,
+            status=status.HTTP_400_BAD_REQUEST)
+
+    def create_bulk(self, request, *args, **kwargs):
+        """Подписка на несколько авторов"""
+        return self.bulk_add_to_list(
+            request,
+            self.get_bulk_ids(request, 'authors'),
+            CustomUser,
+            Follow,
+            'author',
+            forbidden=(request.user.id,))
+
+    def delete_bulk(self, request, *args, **kwargs):
+        """Отписка от нескольких авторов"""
+        return self.bulk_remove_from_list(
+            request,
+            self.get_bulk_ids(request, 'authors'),
+            CustomUser,
+            Follow,
+            'author')
 
 
-class FavoriteRecipeViewSet(RecipeActionMixin, viewsets.ModelViewSet):
+class FavoriteRecipeViewSet(QueryBudgetMixin, RecipeActionMixin,
+                            BulkActionMixin,
+                            viewsets.ModelViewSet):
     """ViewSet для списка избранных рецептов
     Добавление /
-    удаление из списка
+    удаление из списка /
+    пакетные добавление и удаление
     """
     serializer_class = FavoriteRecipeSerializer
     queryset = FavoriteRecipe.objects.all()
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'create': 6,
+        'delete': 3,
+        'create_bulk': 4,
+        'delete_bulk': 4,
+    }
 
     def create(self, request, *args, **kwargs):
         """Добавление рецепта в список избранного"""
@@ -231,17 +438,42 @@ class FavoriteRecipeViewSet(RecipeActionMixin, viewsets.ModelViewSet):
             FavoriteRecipe,
             RECIPE_NOT_IN_FAVORITES_ERROR)
 
+    def create_bulk(self, request, *args, **kwargs):
+        """Добавление нескольких рецептов в избранное"""
+        return self.bulk_add_to_list(
+            request,
+            self.get_bulk_ids(request, 'recipes'),
+            Recipe,
+            FavoriteRecipe,
+            'recipe')
+
+    def delete_bulk(self, request, *args, **kwargs):
+        """Удаление нескольких рецептов из избранного"""
+        return self.bulk_remove_from_list(
+            request,
+            self.get_bulk_ids(request, 'recipes'),
+            Recipe,
+            FavoriteRecipe,
+            'recipe')
+
 
-class ShoppingViewSet(RecipeActionMixin, viewsets.ModelViewSet):
+class ShoppingViewSet(QueryBudgetMixin, RecipeActionMixin, BulkActionMixin,
+                      viewsets.ModelViewSet):
     """ViewSet для списка покупок
     Добавление рецепта в список покупок /
     удаление рецепта из списка покупок /
-    скачивание списка покупок
+    пакетные добавление и удаление
     """
     serializer_class = ShoppingListSerializer
     pagination_class = CustomPagination
     queryset = ShoppingList.objects.all()
     permission_classes = [IsAuthenticated]
+    query_budgets = {
+        'create': 6,
+        'delete': 3,
+        'create_bulk': 4,
+        'delete_bulk': 4,
+    }
 
     def create(self, request, *args, **kwargs):
         """Добавление рецепта в список покупок"""
@@ -260,3 +492,21 @@ class ShoppingViewSet(RecipeActionMixin, viewsets.ModelViewSet):
             recipe_id,
             ShoppingList,
             RECIPE_NOT_IN_SHOPPING_CART_ERROR)
+
+    def create_bulk(self, request, *args, **kwargs):
+        """Добавление нескольких рецептов в список покупок"""
+        return self.bulk_add_to_list(
+            request,
+            self.get_bulk_ids(request, 'recipes'),
+            Recipe,
+            ShoppingList,
+            'recipe')
+
+    def delete_bulk(self, request, *args, **kwargs):
+        """Удаление нескольких рецептов из списка покупок"""
+        return self.bulk_remove_from_list(
+            request,
+            self.get_bulk_ids(request, 'recipes'),
+            Recipe,
+            ShoppingList,
+            'recipe')
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,9 +25,10 @@ INSTALLED_APPS = [
     'djoser',
     'django_filters',
 
-    'recipes',
+    'recipes.apps.RecipesConfig',
     'api',
     'users',
+    'tasks',
 ]
 
 MIDDLEWARE = [
@@ -39,6 +41,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if DEBUG:
+    MIDDLEWARE.append('api.middleware.QueryShapeMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -72,6 +77,53 @@ DATABASES = {
             'NAME': None, }, },
 }
 
+# Общий кеш нужен, чтобы лимиты запросов действовали на все воркеры:
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# CACHE_LOCATION=memcached:11211
+# (так настроено в infra/docker-compose*.yml). С LocMemCache gunicorn
+# запускается только с одним воркером, см. gunicorn.conf.py.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
+# Основной алгоритм хеширования паролей: argon2, bcrypt или pbkdf2.
+# Остальные остаются в списке для проверки старых хешей.
+PASSWORD_HASHING = os.getenv('PASSWORD_HASHING', 'argon2')
+
+PASSWORD_HASHER_CLASSES = {
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'bcrypt': 'users.hashers.BCryptSHA256PasswordHasher',
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+}
+
+PASSWORD_HASHERS = sorted(
+    PASSWORD_HASHER_CLASSES.values(),
+    key=lambda path: path != PASSWORD_HASHER_CLASSES[PASSWORD_HASHING],
+)
+
+# Сколько хешей паролей считается одновременно на всём хосте (во всех
+# воркерах gunicorn вместе). Память под argon2 — до
+# PASSWORD_HASHING_WORKERS * ARGON2_MEMORY_COST КиБ; ждущий своей очереди
+# sync-воркер занят, поэтому значение должно быть меньше GUNICORN_WORKERS.
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', 2))
+
+# Каталог файлов-слотов для PASSWORD_HASHING_WORKERS, общий для воркеров.
+PASSWORD_HASHING_LOCK_DIR = os.getenv('PASSWORD_HASHING_LOCK_DIR',
+                                      tempfile.gettempdir())
+
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 2))
+
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 64 * 1024))
+
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 1))
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,6 +156,10 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
@@ -112,6 +168,19 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttles.AnonWindowThrottle',
+        'api.throttles.UserWindowThrottle',
+    ),
+    # Перед gunicorn стоит nginx: IP клиента — последний адрес,
+    # который nginx добавил в X-Forwarded-For.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('THROTTLE_RATE_ANON', '120/min'),
+        'user': os.getenv('THROTTLE_RATE_USER', '600/min'),
+        'export': os.getenv('THROTTLE_RATE_EXPORT', '20/hour'),
+        'recipe_create': os.getenv('THROTTLE_RATE_RECIPE_CREATE', '30/hour'),
+    },
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
@@ -141,7 +210,71 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/app/media/'
 
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'filesystem')
+
+DEFAULT_FILE_STORAGE = {
+    'filesystem': 'recipes.storage.ContentHashStorage',
+    's3': 'recipes.storage.S3ContentHashStorage',
+}[MEDIA_STORAGE]
+
+AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME', 'media')
+
+AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL')
+
+AWS_S3_CUSTOM_DOMAIN = os.getenv('AWS_S3_CUSTOM_DOMAIN')
+
+AWS_S3_URL_PROTOCOL = os.getenv('AWS_S3_URL_PROTOCOL', 'https:')
+
+AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
+
+AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
+
+AWS_S3_ADDRESSING_STYLE = 'path'
+
+AWS_QUERYSTRING_AUTH = False
+
+AWS_DEFAULT_ACL = None
+
+# Имена по содержимому: перезапись не меняет файл, а проверка
+# свободного имени лишь добавила бы запрос к хранилищу.
+AWS_S3_FILE_OVERWRITE = True
+
+AWS_S3_OBJECT_PARAMETERS = {
+    'CacheControl': 'public, max-age=31536000, immutable',
+}
+
 
 STATIC_URL = '/static/django/'
 
 STATIC_ROOT = '/app/static_django/'
+
+
+RECIPE_TRENDING_HALF_LIFE_HOURS = float(
+    os.getenv('RECIPE_TRENDING_HALF_LIFE_HOURS', 72))
+
+
+RECIPE_INDEX_ENABLED = bool(int(os.getenv('RECIPE_INDEX_ENABLED', False)))
+
+RECIPE_INDEX_MAX_BYTES = int(os.getenv('RECIPE_INDEX_MAX_BYTES',
+                                       64 * 1024 * 1024))
+
+RECIPE_INDEX_POLL_SECONDS = 2
+
+RECIPE_DETAIL_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_DETAIL_CACHE_TIMEOUT', 24 * 60 * 60))
+
+RECIPE_CHANGES_LIMIT = 10000
+
+
+QUERY_BUDGET_ENFORCE = bool(int(os.getenv('QUERY_BUDGET_ENFORCE', False)))
+
+QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 3))
+
+
+TASKS_BACKEND = os.getenv('TASKS_BACKEND', 'local')
+
+TASKS_LOCAL_WORKERS = int(os.getenv('TASKS_LOCAL_WORKERS', 2))
+
+TASKS_MAX_ATTEMPTS = 3
+
+TASKS_RETRY_DELAY = 5
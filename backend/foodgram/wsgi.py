@@ -5,3 +5,24 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+
+def warm_up():
+    """Импортирует то, что воркеры иначе загрузили бы на первом запросе
+    (urls со всеми вьюхами, плагины PIL), и строит индекс рецептов.
+    Соединение с базой закрывается, чтобы форкнутые воркеры не делили его.
+    """
+    from django.conf import settings
+    from django.db import connections
+    from django.urls import get_resolver
+    from PIL import Image
+
+    get_resolver().url_patterns
+    Image.init()
+    if settings.RECIPE_INDEX_ENABLED:
+        from api.recipe_index import load_index
+        load_index()
+        connections.close_all()
+
+
+warm_up()
@@ -0,0 +1,55 @@
+"""Настройки Gunicorn для продакшена.
+
+Приложение загружается один раз в мастер-процессе (preload_app), воркеры
+получают его через fork. Перед форком сборщик мусора замораживается:
+объекты, созданные при импорте, уходят в постоянное поколение, сборщик
+в воркерах их не обходит, и страницы памяти остаются общими
+(copy-on-write).
+
+С несколькими воркерами кеш должен быть общим (memcached): лимиты
+запросов хранятся в кеше, и в локальном кеше процесса каждый воркер
+считал бы их отдельно. Такой запуск останавливается сразу.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS',
+                        multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+preload_app = bool(int(os.getenv('GUNICORN_PRELOAD', 1)))
+
+# Перезапуск воркера после max_requests запросов ограничивает рост памяти,
+# разброс не даёт всем воркерам перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Heartbeat-файлы воркеров в памяти, а не на overlay-фс контейнера.
+worker_tmp_dir = '/dev/shm'
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def on_starting(server):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+    backend = settings.CACHES['default']['BACKEND']
+    if workers > 1 and backend in PROCESS_LOCAL_CACHES:
+        raise RuntimeError(
+            f'{backend} не общий для {workers} воркеров: задайте '
+            f'CACHE_BACKEND и CACHE_LOCATION (memcached) или '
+            f'GUNICORN_WORKERS=1')
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
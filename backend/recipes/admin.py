@@ -1,41 +1,62 @@
 from django.contrib import admin
 
-from .models import (Ingredient, IngredientRecipe, Recipe, FavoriteRecipe,
-                     ShoppingList, Tag)
+from .models import (Ingredient, IngredientNutrition, IngredientRecipe,
+                     Recipe, FavoriteRecipe, ShoppingList, Tag)
+from .scores import count_of
 
 
 class RecipeIngredientInline(admin.TabularInline):
     """
     Админ-зона для интеграции добавления ингридиентов в рецепты.
+    Ингредиент выбирается через поиск, а не из списка всего каталога.
     """
     model = IngredientRecipe
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class RecipeAdmin(admin.ModelAdmin):
     """Админ-зона рецептов.
-    Добавлен просмотр кол-ва добавленных рецептов в избранное.
+    Добавлен просмотр кол-ва добавленных рецептов в избранное,
+    счётчик считается одним запросом для всей страницы.
     """
     inlines = [RecipeIngredientInline]
     list_display = ('name', 'author', 'favorites_count')
+    list_select_related = ('author',)
     search_fields = ('name',)
-    list_filter = ('name', 'author', 'tags')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     exclude = ('ingredients',)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorites_count=count_of(FavoriteRecipe.objects, 'recipe', 'pk'))
 
     def favorites_count(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
     favorites_count.short_description = 'Количество добавлений в избранное'
+    favorites_count.admin_order_field = 'favorites_count'
+
+
+class IngredientNutritionInline(admin.StackedInline):
+    """Калорийность и цена ингредиента."""
+    model = IngredientNutrition
 
 
 class IngredientAdmin(admin.ModelAdmin):
     """
     Админзона ингридиентов.
     """
-    list_display = ('name',)
-    search_fields = ('name',)
-    list_filter = ('name',)
+    inlines = [IngredientNutritionInline]
+    list_display = ('name', 'measurement_unit')
+    search_fields = ('^name',)
+    list_filter = ('measurement_unit',)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -48,8 +69,19 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
+class UserRecipeAdmin(admin.ModelAdmin):
+    """
+    Админзона избранного и списков покупок.
+    """
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
+
+
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
-admin.site.register(FavoriteRecipe)
-admin.site.register(ShoppingList)
+admin.site.register(FavoriteRecipe, UserRecipeAdmin)
+admin.site.register(ShoppingList, UserRecipeAdmin)
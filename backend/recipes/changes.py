@@ -0,0 +1,131 @@
+"""Версии рецептов и журнал изменений.
+
+Любое изменение рецепта, его ингредиентов или тегов увеличивает
+Recipe.version, обновляет updated_at и добавляет строку в RecipeChange
+в той же транзакции. Внутри одной транзакции рецепт отмечается один раз:
+редактирование через API с десятком ингредиентов даёт одну новую версию
+и одну запись журнала. Позицию в журнале записи получают после коммита
+(publish_changes): так клиент, дочитавший до позиции N, не пропустит
+транзакцию, которая вставила записи раньше, а закоммитилась позже.
+Переименование ингредиента затрагивает все
+рецепты с ним, поэтому их версии меняет фоновая задача после коммита.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.commit_hooks import on_commit_once, transaction_hook
+from recipes.models import (DataVersion, IngredientRecipe, Recipe,
+                            RecipeChange)
+from tasks.queue import enqueue
+
+BUMP_BATCH_SIZE = 1000
+
+CHANGES_POSITION = 'recipe-changes'
+
+
+class TouchedRecipes(set):
+    """id рецептов, уже отмеченных в текущей транзакции.
+    Пустой хук после коммита: при откате транзакции или точки
+    сохранения он пропадает, и набор начинается заново.
+    """
+
+    def __call__(self):
+        pass
+
+
+def touched_recipes():
+    touched = transaction_hook(TouchedRecipes)
+    return TouchedRecipes() if touched is None else touched
+
+
+def record_changes(recipe_ids, action):
+    if not recipe_ids:
+        return
+    RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id, action=action)
+        for recipe_id in recipe_ids
+    )
+    on_commit_once(publish_changes)
+
+
+def publish_changes():
+    """Хук после коммита: выдаёт позиции всем закоммиченным записям
+    журнала без позиции. Выдача идёт под блокировкой строки счётчика,
+    поэтому позиции растут в порядке коммитов этих транзакций. Записи,
+    чей хук не выполнился (упал процесс), получат позицию при следующем
+    вызове.
+    """
+    with transaction.atomic():
+        counter, _ = DataVersion.objects.select_for_update().get_or_create(
+            name=CHANGES_POSITION)
+        changes = list(RecipeChange.objects.filter(
+            position__isnull=True).order_by('id').only('id'))
+        if not changes:
+            return
+        for position, change in enumerate(changes, counter.value + 1):
+            change.position = position
+        RecipeChange.objects.bulk_update(changes, ['position'],
+                                         batch_size=BUMP_BATCH_SIZE)
+        counter.value += len(changes)
+        counter.save(update_fields=['value'])
+
+
+def bump_recipe_versions(queryset):
+    """Новая версия и запись в журнале для рецептов из queryset."""
+    touched = touched_recipes()
+    recipe_ids = [
+        recipe_id for recipe_id in queryset.order_by().values_list(
+            'pk', flat=True)
+        if recipe_id not in touched
+    ]
+    if not recipe_ids:
+        return
+    touched.update(recipe_ids)
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        version=F('version') + 1, updated_at=timezone.now())
+    record_changes(recipe_ids, RecipeChange.UPDATED)
+
+
+def bump_recipe_version(recipe_id):
+    """bump_recipe_versions для одного рецепта. Если рецепт уже отмечен
+    в транзакции, запросов нет: сигналы приходят на каждую строку
+    состава, и удаление рецепта с полусотней ингредиентов не должно
+    стоить полусотни SELECT.
+    """
+    if recipe_id in touched_recipes():
+        return
+    bump_recipe_versions(Recipe.objects.filter(pk=recipe_id))
+
+
+def recipe_deleted(recipe_id):
+    touched_recipes().discard(recipe_id)
+    record_changes([recipe_id], RecipeChange.DELETED)
+
+
+def bump_ingredient_recipes(ingredient_ids):
+    """Фоновая задача: новые версии рецептов с этими ингредиентами."""
+    recipe_ids = list(IngredientRecipe.objects.filter(
+        ingredient_id__in=ingredient_ids,
+    ).order_by('recipe_id').values_list('recipe_id', flat=True).distinct())
+    for start in range(0, len(recipe_ids), BUMP_BATCH_SIZE):
+        with transaction.atomic():
+            bump_recipe_versions(Recipe.objects.filter(
+                pk__in=recipe_ids[start:start + BUMP_BATCH_SIZE]))
+
+
+class RenamedIngredients(set):
+    """Ингредиенты, переименованные в текущей транзакции; после коммита
+    для них ставится одна задача.
+    """
+
+    def __call__(self):
+        enqueue(bump_ingredient_recipes, sorted(self))
+
+
+def schedule_ingredient_bump(ingredient_id):
+    renamed = transaction_hook(RenamedIngredients)
+    if renamed is None:
+        enqueue(bump_ingredient_recipes, [ingredient_id])
+    else:
+        renamed.add(ingredient_id)
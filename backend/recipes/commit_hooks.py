@@ -0,0 +1,102 @@
+"""Хуки после коммита, общие для текущей транзакции.
+
+Сигналы приходят на каждую строку, а работа после коммита нужна одна на
+транзакцию: один хук копит id рецептов или ингредиентов и выполняется
+один раз. Хук ищется в собственном реестре, а регистрируется только через
+transaction.on_commit.
+
+Реестр хранит хуки по слабым ссылкам. Django выбрасывает хуки при откате
+транзакции или точки сохранения, в которой они зарегистрированы, и тогда
+хук исчезает и из реестра. Первым в транзакции регистрируется маркер
+TransactionHooks: после коммита он выполняется раньше остальных хуков
+и очищает реестр, поэтому хуки, открывающие новые транзакции, работают
+уже с новым состоянием.
+"""
+import threading
+import weakref
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+class TransactionHooks:
+    """Хуки одной транзакции на одном соединении."""
+
+    def __init__(self):
+        self.hooks = weakref.WeakValueDictionary()
+        self.committed = False
+
+    def __call__(self):
+        self.committed = True
+        self.hooks.clear()
+
+
+def current_hooks(connection):
+    markers = _local.__dict__.setdefault('markers', {})
+    marker = markers.get(connection.alias)
+    marker = marker() if marker is not None else None
+    if marker is None or marker.committed:
+        marker = TransactionHooks()
+        markers[connection.alias] = weakref.ref(marker)
+        transaction.on_commit(marker, using=connection.alias)
+    return marker
+
+
+def transaction_hook(factory, key=None, using=None):
+    """Хук factory() текущей транзакции: создаётся и регистрируется
+    в on_commit при первом обращении. Вне транзакции возвращает None.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    hooks = current_hooks(connection).hooks
+    key = factory if key is None else key
+    hook = hooks.get(key)
+    if hook is None:
+        hook = factory()
+        hooks[key] = hook
+        transaction.on_commit(hook, using=connection.alias)
+    return hook
+
+
+class CallOnce:
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self):
+        self.func()
+
+
+def on_commit_once(func, using=None):
+    """transaction.on_commit, но не более одного раза за транзакцию."""
+    if transaction_hook(lambda: CallOnce(func), key=func,
+                        using=using) is None:
+        func()
+
+
+@contextmanager
+def captured_commit_hooks():
+    """Хуки transaction.on_commit не регистрируются, а собираются в список,
+    как captureOnCommitCallbacks в тестах Django 3.2+. Реестр на это время
+    пустой: хуки, зарегистрированные раньше в той же транзакции, не
+    перехватывают новые изменения.
+    """
+    hooks = []
+    on_commit = transaction.on_commit
+    markers = _local.__dict__.pop('markers', None)
+    transaction.on_commit = lambda func, using=None: hooks.append(func)
+    try:
+        yield hooks
+    finally:
+        transaction.on_commit = on_commit
+        _local.__dict__.pop('markers', None)
+        if markers is not None:
+            _local.markers = markers
+
+
+def run_hooks(hooks):
+    """Выполняет собранные хуки, включая добавленные по ходу."""
+    while hooks:
+        hooks.pop(0)()
@@ -0,0 +1,21 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import DEFAULT_TOP_K, build_neighbors
+
+
+class Command(BaseCommand):
+    help = ('Строит таблицу похожих рецептов по совместному добавлению '
+            'в избранное. Запускается периодически (cron).')
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                            help='сколько похожих рецептов хранить')
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        count = build_neighbors(options['top_k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожих рецептов: {count}, {perf_counter() - started:.1f} с'))
@@ -0,0 +1,46 @@
+import os
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from recipes.transfer import (DEFAULT_CHUNK_SIZE, export_chunks,
+                              last_exported_id)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты в NDJSON: строка на рецепт с тегами, '
+            'ингредиентами и именем картинки.')
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="файл выгрузки, '-' — stdout")
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--resume', action='store_true',
+                            help='дописать существующий файл с места, '
+                                 'где выгрузка прервалась')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        after_id = 0
+        if path == '-':
+            output = sys.stdout
+        else:
+            if options['resume'] and os.path.exists(path):
+                after_id = last_exported_id(path)
+            output = open(path, 'a' if options['resume'] else 'w',
+                          encoding='utf-8')
+        started = perf_counter()
+        total = 0
+        try:
+            for lines in export_chunks(after_id, options['chunk_size']):
+                output.writelines(lines)
+                total += len(lines)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} в секунду)'))
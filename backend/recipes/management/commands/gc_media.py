@@ -0,0 +1,57 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Recipe
+from recipes.storage import walk_files
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из хранилища медиа картинки рецептов, на которые '
+            'не ссылается ни один рецепт. Запускается периодически (cron).')
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='не трогать файлы моложе этого срока: '
+                                 'рецепт с ними может быть ещё не сохранён')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        prefix = field.upload_to.rstrip('/')
+        threshold = timezone.now() - timedelta(hours=options['grace_hours'])
+        files = walk_files(storage, prefix)
+        checked = removed = freed = 0
+        while True:
+            batch = list(islice(files, BATCH_SIZE))
+            if not batch:
+                break
+            checked += len(batch)
+            # Проверка пачкой по индексу на Recipe.image.
+            referenced = set(Recipe.objects.filter(
+                image__in=batch).values_list('image', flat=True))
+            for name in batch:
+                if name in referenced:
+                    continue
+                if storage.get_modified_time(name) > threshold:
+                    continue
+                # Ссылка могла появиться после проверки пачки.
+                if Recipe.objects.filter(image=name).exists():
+                    continue
+                removed += 1
+                freed += storage.size(name)
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {checked}. {action}: {removed} '
+            f'({freed / 1024 / 1024:.1f} МБ)'))
@@ -3,11 +3,14 @@ import os
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from recipes.models import Ingredient
+from recipes.models import Ingredient, IngredientNutrition
 
 
 class Command(BaseCommand):
+    requires_system_checks = False
+
     def add_arguments(self, parser):
         parser.add_argument("filename", nargs="+", type=str)
 
@@ -23,7 +26,8 @@ class Command(BaseCommand):
                 next(reader)
                 handler = self.get_handler(filename)
                 if handler:
-                    self.process_file(reader, handler)
+                    with transaction.atomic():
+                        self.process_file(reader, handler)
                 else:
                     self.stdout.write(self.style.ERROR(
                         f"Файл '{filename}' не найден."))
@@ -31,6 +35,7 @@ class Command(BaseCommand):
     def get_handler(self, filename):
         handlers = {
             "ingredients.csv": self.process_ingredients,
+            "nutrition.csv": self.process_nutrition,
         }
         return handlers.get(filename)
 
@@ -44,3 +49,22 @@ class Command(BaseCommand):
             name=name,
             measurement_unit=measurement_unit,
         )
+
+    def process_nutrition(self, row):
+        """Строка: название, единица, ккал и цена на единицу
+        (пустое значение — нет данных).
+        """
+        name, measurement_unit, calories, price = row[:4]
+        ingredient = Ingredient.objects.filter(
+            name=name, measurement_unit=measurement_unit).first()
+        if ingredient is None:
+            self.stdout.write(self.style.WARNING(
+                f"Ингредиент '{name}, {measurement_unit}' не найден."))
+            return
+        IngredientNutrition.objects.update_or_create(
+            ingredient=ingredient,
+            defaults={
+                'calories': float(calories) if calories else None,
+                'price': price or None,
+            },
+        )
@@ -0,0 +1,85 @@
+import json
+import os
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import DataVersion
+from recipes.transfer import DEFAULT_CHUNK_SIZE, RecipeImporter
+
+CHECKPOINT_PREFIX = 'import-recipes:'
+
+
+class Command(BaseCommand):
+    help = ('Загружает рецепты из NDJSON-файла export_recipes. Смещение '
+            'в файле сохраняется в базе (DataVersion) в одной транзакции '
+            'с пачкой, повторный запуск продолжает с него.')
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--checkpoint',
+                            help='имя контрольной точки (по умолчанию '
+                                 'имя файла)')
+        parser.add_argument('--restart', action='store_true',
+                            help='начать с начала файла')
+
+    def checkpoint_name(self, path, name):
+        name = f'{CHECKPOINT_PREFIX}{name or os.path.basename(path)}'
+        if len(name) > DataVersion._meta.get_field('name').max_length:
+            raise CommandError(f'Слишком длинное имя контрольной точки: '
+                               f'{name}')
+        return name
+
+    def read_checkpoint(self, name):
+        return DataVersion.objects.filter(name=name).values_list(
+            'value', flat=True).first() or 0
+
+    def write_checkpoint(self, name, offset):
+        DataVersion.objects.update_or_create(name=name,
+                                             defaults={'value': offset})
+
+    def load(self, importer, batch, checkpoint, offset):
+        """Пачка и смещение после неё коммитятся вместе: после сбоя
+        повторный запуск не загрузит пачку второй раз и не пропустит её.
+        """
+        with transaction.atomic():
+            if batch:
+                importer.load_batch(batch)
+            self.write_checkpoint(checkpoint, offset)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = self.checkpoint_name(path, options['checkpoint'])
+        offset = 0 if options['restart'] else self.read_checkpoint(checkpoint)
+        chunk_size = options['chunk_size']
+        importer = RecipeImporter()
+        started = perf_counter()
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            batch = []
+            for line in file:
+                if line.strip():
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        raise CommandError(
+                            f'Некорректная строка по смещению {offset}')
+                offset += len(line)
+                if len(batch) == chunk_size:
+                    self.load(importer, batch, checkpoint, offset)
+                    batch = []
+            self.load(importer, batch, checkpoint, offset)
+        elapsed = perf_counter() - started
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {stats.recipes} за {elapsed:.1f} с '
+            f'({stats.recipes / max(elapsed, 1e-9):.0f} в секунду)'))
+        if stats.skipped or stats.missing_tags or stats.missing_ingredients:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено рецептов без автора: {stats.skipped}, '
+                f'тегов: {stats.missing_tags}, '
+                f'ингредиентов: {stats.missing_ingredients}'))
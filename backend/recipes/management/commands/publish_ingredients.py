@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.snapshots import publish_ingredient_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Публикует снимок каталога ингредиентов в статике.'
+    requires_system_checks = False
+
+    def handle(self, *args, **options):
+        manifest = publish_ingredient_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Снимок {manifest['version']}: {manifest['count']} "
+            f"ингредиентов, {manifest['url']}"))
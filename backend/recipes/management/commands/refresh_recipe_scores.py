@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает популярность рецептов и применяет затухание '
+            'к тренду. Запускается периодически (cron).')
+    requires_system_checks = False
+
+    def handle(self, *args, **options):
+        total = refresh_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны рейтинги {total} рецептов'))
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.4 on 2026-10-19 08:20
+
+from django.db import migrations, models
+
+# Копия recipes.units.UNIT_CONVERSIONS на момент миграции: миграция не
+# должна зависеть от того, как таблица изменится потом.
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 200),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+}
+
+
+def fill_canonical_units(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    units = Ingredient.objects.values_list(
+        'measurement_unit', flat=True).distinct()
+    for measurement_unit in list(units):
+        unit = measurement_unit.strip()
+        canonical_unit, unit_factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+        Ingredient.objects.filter(measurement_unit=measurement_unit).update(
+            canonical_unit=canonical_unit, unit_factor=unit_factor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipeneighbor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical_unit',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Базовая единица'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='unit_factor',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Множитель к базовой единице'),
+        ),
+        migrations.RunPython(fill_canonical_units, migrations.RunPython.noop),
+    ]
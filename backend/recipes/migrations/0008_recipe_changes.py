@@ -0,0 +1,49 @@
+# Generated by Django 3.1.4 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    """Существующие рецепты попадают в журнал одной записью каждый,
+    чтобы клиент, начавший с since=0, получил весь каталог.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeChange = apps.get_model('recipes', 'RecipeChange')
+    Recipe.objects.update(updated_at=models.F('pub_date'))
+    schema_editor.execute(
+        f'INSERT INTO {RecipeChange._meta.db_table} '
+        f'(recipe_id, action, created_at) '
+        f'SELECT id, %s, pub_date FROM {Recipe._meta.db_table} '
+        f'ORDER BY pub_date, id',
+        ['updated'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('recipe_id', models.IntegerField(verbose_name='Рецепт')),
+                ('action', models.CharField(choices=[('updated', 'Изменён'), ('deleted', 'Удалён')], max_length=7, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Журнал изменений рецептов',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
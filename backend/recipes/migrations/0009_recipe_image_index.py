@@ -0,0 +1,18 @@
+# Generated by Django 3.1.4 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, upload_to='recipes/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.1.4 on 2026-10-19 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_rollups(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeNutrition = apps.get_model('recipes', 'RecipeNutrition')
+    RecipeNutrition.objects.bulk_create(
+        [RecipeNutrition(recipe_id=recipe_id) for recipe_id in
+         Recipe.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_user_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientNutrition',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('calories', models.FloatField(blank=True, null=True, verbose_name='Ккал на единицу')),
+                ('price', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True, verbose_name='Цена за единицу')),
+            ],
+            options={
+                'verbose_name': 'Пищевая ценность ингредиента',
+                'verbose_name_plural': 'Пищевая ценность ингредиентов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeNutrition',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('calories', models.FloatField(db_index=True, default=0, verbose_name='Калорийность')),
+                ('price', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12, verbose_name='Стоимость')),
+            ],
+            options={
+                'verbose_name': 'Пищевая ценность рецепта',
+                'verbose_name_plural': 'Пищевая ценность рецептов',
+            },
+        ),
+        migrations.RunPython(create_rollups, migrations.RunPython.noop),
+    ]
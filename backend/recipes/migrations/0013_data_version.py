@@ -0,0 +1,34 @@
+# Generated by Django 3.1.4 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+def create_recipes_version(apps, schema_editor):
+    """Строка версии рецептов создаётся сразу, чтобы её смена всегда
+    была одним UPDATE.
+    """
+    DataVersion = apps.get_model('recipes', 'DataVersion')
+    DataVersion.objects.get_or_create(name='recipes')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Данные')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+        migrations.RunPython(create_recipes_version,
+                             migrations.RunPython.noop),
+    ]
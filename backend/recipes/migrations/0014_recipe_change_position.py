@@ -0,0 +1,32 @@
+# Generated by Django 3.1.4 on 2026-10-19 09:22
+
+from django.db import migrations, models
+
+
+def number_existing_changes(apps, schema_editor):
+    """Существующие записи получают позицию, равную id: курсоры
+    since, выданные до миграции, остаются верными.
+    """
+    RecipeChange = apps.get_model('recipes', 'RecipeChange')
+    DataVersion = apps.get_model('recipes', 'DataVersion')
+    RecipeChange.objects.update(position=models.F('id'))
+    last = RecipeChange.objects.aggregate(last=models.Max('id'))['last']
+    DataVersion.objects.update_or_create(name='recipe-changes',
+                                         defaults={'value': last or 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipechange',
+            name='position',
+            field=models.BigIntegerField(null=True, unique=True, verbose_name='Позиция'),
+        ),
+        migrations.RunPython(number_existing_changes,
+                             migrations.RunPython.noop),
+    ]
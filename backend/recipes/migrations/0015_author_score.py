@@ -0,0 +1,27 @@
+# Generated by Django 3.1.4 on 2026-10-19 09:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_recipe_change_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorScore',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_score', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('pending_trending', models.FloatField(default=0, verbose_name='Прирост тренда')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг автора',
+                'verbose_name_plural': 'Рейтинги авторов',
+            },
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.core.validators import MinValueValidator
 from django.db import models
 
 from api.constants import COOKING_TIME_ERROR, INGREDIENT_AMOUNT_ERROR
+from recipes.units import normalize_unit
 
 
 User = get_user_model()
@@ -51,6 +52,14 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=200, verbose_name='Единицы измерения'
     )
+    canonical_unit = models.CharField(
+        max_length=200, verbose_name='Базовая единица', default='',
+        editable=False,
+    )
+    unit_factor = models.PositiveIntegerField(
+        default=1, verbose_name='Множитель к базовой единице',
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-id']
@@ -65,6 +74,33 @@ class Ingredient(models.Model):
     def __str__(self):
         return f'{self.name} ({self.measurement_unit})'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.saved_label = instance.label
+        return instance
+
+    @property
+    def label(self):
+        """Название и единица; None, если одно из полей не загружено."""
+        if {'name', 'measurement_unit'} & self.get_deferred_fields():
+            return None
+        return self.name, self.measurement_unit
+
+    @property
+    def label_changed(self):
+        """Название или единица изменились после загрузки из базы
+        (для объекта не из базы считается, что изменились).
+        """
+        saved_label = getattr(self, 'saved_label', None)
+        return saved_label is None or saved_label != self.label
+
+    def save(self, *args, **kwargs):
+        self.canonical_unit, self.unit_factor = normalize_unit(
+            self.measurement_unit)
+        super().save(*args, **kwargs)
+        self.saved_label = self.label
+
 
 class Recipe(models.Model):
     """Модель Рецептов"""
@@ -93,7 +129,8 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='recipes/',
-        blank=True
+        blank=True,
+        db_index=True,
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
@@ -104,15 +141,41 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Теги',
     )
+    version = models.PositiveIntegerField(
+        'Версия', default=1, editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['cooking_time', '-pub_date'],
+                         name='recipe_cooking_time_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """version меняют только сигналы (recipes.changes), поэтому
+        при сохранении существующего рецепта значение из памяти
+        не записывается поверх новой версии.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientRecipe(models.Model):
     """Модель для связи рецепта и ингредиентов"""
@@ -166,6 +229,9 @@ class FavoriteRecipe(models.Model):
                 fields=['user', 'recipe'],
                 name='unique_favorite_recipe_for_user'),
         ]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='favorite_user_id_idx'),
+        ]
 
     def __str__(self):
         return f'Список избранных рецептов{self.user} - {self.recipe}'
@@ -194,6 +260,10 @@ class ShoppingList(models.Model):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique_shoppingcart_user')
         ]
+        indexes = [
+            models.Index(fields=['user', '-id'],
+                         name='shoppinglist_user_id_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
@@ -227,3 +297,177 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан {self.author}'
+
+
+class RecipeChange(models.Model):
+    """Запись журнала изменений рецептов. Журнал только дополняется:
+    по нему клиенты и кеши забирают изменения после известной позиции.
+    Позиция выдаётся после коммита транзакции (recipes.changes
+    .publish_changes), поэтому позиции идут в порядке коммитов, а не
+    вставок. recipe_id не внешний ключ, чтобы запись об удалении
+    сохранялась.
+    """
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (UPDATED, 'Изменён'),
+        (DELETED, 'Удалён'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    recipe_id = models.IntegerField('Рецепт')
+    action = models.CharField('Действие', max_length=7, choices=ACTIONS)
+    created_at = models.DateTimeField('Время', auto_now_add=True)
+    position = models.BigIntegerField('Позиция', null=True, unique=True)
+
+    class Meta:
+        ordering = ('id', )
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Журнал изменений рецептов'
+
+    def __str__(self):
+        return f'{self.id}: {self.recipe_id} {self.action}'
+
+
+class RecipeScore(models.Model):
+    """Рейтинг рецепта для сортировки по популярности.
+    Обновляется инкрементально при добавлении в избранное и список
+    покупок; подписки на автора копятся в AuthorScore и попадают сюда
+    при пересчёте командой refresh_recipe_scores.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт',
+    )
+    popular = models.FloatField('Популярность', default=0)
+    trending = models.FloatField('Набирает популярность', default=0)
+    refreshed_at = models.DateTimeField('Пересчитан', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(fields=['-popular'], name='recipescore_popular_idx'),
+            models.Index(fields=['-trending'],
+                         name='recipescore_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.popular:.1f} / {self.trending:.1f}'
+
+
+class AuthorScore(models.Model):
+    """Прирост тренда от подписок на автора с прошлого пересчёта.
+    Подписка меняет одну строку автора, а не рейтинги всех его рецептов.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='author_score',
+        verbose_name='Автор',
+    )
+    pending_trending = models.FloatField('Прирост тренда', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг автора'
+        verbose_name_plural = 'Рейтинги авторов'
+
+    def __str__(self):
+        return f'{self.author_id}: {self.pending_trending:+.1f}'
+
+
+class IngredientNutrition(models.Model):
+    """Калорийность и цена ингредиента в расчёте на единицу его
+    measurement_unit. Необязательны, загружаются командой import_data
+    из data/nutrition.csv.
+    """
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='nutrition',
+        verbose_name='Ингредиент',
+    )
+    calories = models.FloatField('Ккал на единицу', null=True, blank=True)
+    price = models.DecimalField('Цена за единицу', max_digits=10,
+                                decimal_places=4, null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Пищевая ценность ингредиента'
+        verbose_name_plural = 'Пищевая ценность ингредиентов'
+
+    def __str__(self):
+        return f'{self.ingredient_id}: {self.calories} ккал / {self.price}'
+
+
+class RecipeNutrition(models.Model):
+    """Итоги рецепта по IngredientNutrition: сумма amount * значение
+    по ингредиентам. Пересчитываются при изменении состава рецепта
+    и значений ингредиентов (recipes.nutrition).
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='nutrition',
+        verbose_name='Рецепт',
+    )
+    calories = models.FloatField('Калорийность', default=0, db_index=True)
+    price = models.DecimalField('Стоимость', max_digits=12, decimal_places=2,
+                                default=0, db_index=True)
+
+    class Meta:
+        verbose_name = 'Пищевая ценность рецепта'
+        verbose_name_plural = 'Пищевая ценность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.calories} ккал / {self.price}'
+
+
+class RecipeNeighbor(models.Model):
+    """Похожий рецепт: его чаще других добавляют в избранное вместе
+    с исходным. Таблица строится командой build_recommendations.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        verbose_name='Рецепт',
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'neighbor'],
+                                    name='unique_recipe_neighbor'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} -> {self.neighbor_id}: {self.score:.3f}'
+
+
+class DataVersion(models.Model):
+    """Счётчик версии данных. Хранится в базе, а не в кеше процесса,
+    чтобы смену версии видели все воркеры (индекс рецептов в памяти).
+    """
+    name = models.CharField('Данные', max_length=64, primary_key=True)
+    value = models.BigIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
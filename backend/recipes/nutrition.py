@@ -0,0 +1,109 @@
+"""Калорийность и стоимость рецептов (RecipeNutrition).
+
+Итоги пересчитываются одним UPDATE с подзапросами только для затронутых
+рецептов: API и импорт — сразу, в той же транзакции; при изменении
+отдельных строк состава (админка, удаление) — один раз после коммита;
+при изменении значений ингредиента — фоновой задачей после коммита,
+потому что ингредиент может входить в тысячи рецептов.
+"""
+from django.db import transaction
+from django.db.models import (DecimalField, ExpressionWrapper, F, FloatField,
+                              OuterRef, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+
+from recipes.changes import bump_recipe_versions
+from recipes.commit_hooks import transaction_hook
+from recipes.models import IngredientRecipe, Recipe, RecipeNutrition
+from tasks.queue import enqueue
+
+REFRESH_BATCH_SIZE = 1000
+
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def recipe_total(attribute, output_field):
+    """Подзапрос: сумма amount * значение ингредиента по рецепту."""
+    return Subquery(
+        IngredientRecipe.objects.filter(
+            recipe_id=OuterRef('recipe_id'),
+        ).order_by().values('recipe_id').annotate(
+            total=Sum(ExpressionWrapper(
+                F('amount') * F(f'ingredient__nutrition__{attribute}'),
+                output_field=output_field)),
+        ).values('total'),
+        output_field=output_field,
+    )
+
+
+def refresh_recipe_nutrition(recipe_ids):
+    RecipeNutrition.objects.filter(recipe_id__in=recipe_ids).update(
+        calories=Coalesce(recipe_total('calories', FloatField()),
+                          Value(0.0)),
+        price=Coalesce(recipe_total('price', PRICE_FIELD),
+                       Value(0, output_field=PRICE_FIELD)),
+    )
+
+
+def refresh_ingredient_nutrition(ingredient_ids):
+    """Фоновая задача: итоги рецептов с этими ингредиентами.
+    Рецепты получают новую версию, чтобы изменения попали в кеши
+    и журнал изменений.
+    """
+    from recipes.signals import bump_recipes_version
+
+    recipe_ids = list(IngredientRecipe.objects.filter(
+        ingredient_id__in=ingredient_ids,
+    ).order_by('recipe_id').values_list('recipe_id', flat=True).distinct())
+    for start in range(0, len(recipe_ids), REFRESH_BATCH_SIZE):
+        batch = recipe_ids[start:start + REFRESH_BATCH_SIZE]
+        with transaction.atomic():
+            refresh_recipe_nutrition(batch)
+            bump_recipe_versions(Recipe.objects.filter(pk__in=batch))
+    if recipe_ids:
+        bump_recipes_version()
+
+
+class PendingRecipes(set):
+    """Рецепты, строки состава которых менялись в текущей транзакции;
+    после коммита их итоги пересчитываются одним UPDATE.
+    """
+
+    def __call__(self):
+        if self:
+            refresh_recipe_nutrition(sorted(self))
+
+
+def refresh_recipes_now(recipe_ids):
+    """Пересчёт в текущей транзакции (API, импорт). Рецепты снимаются
+    с отложенного пересчёта: строки состава, удалённые до этого,
+    уже учтены.
+    """
+    refresh_recipe_nutrition(recipe_ids)
+    pending = transaction_hook(PendingRecipes)
+    if pending is not None:
+        pending.difference_update(recipe_ids)
+
+
+def schedule_recipe_refresh(recipe_id):
+    pending = transaction_hook(PendingRecipes)
+    if pending is None:
+        refresh_recipe_nutrition([recipe_id])
+    else:
+        pending.add(recipe_id)
+
+
+class PendingIngredients(set):
+    """Ингредиенты, изменённые в текущей транзакции; после коммита
+    для них ставится одна задача пересчёта.
+    """
+
+    def __call__(self):
+        enqueue(refresh_ingredient_nutrition, sorted(self))
+
+
+def schedule_ingredient_refresh(ingredient_id):
+    pending = transaction_hook(PendingIngredients)
+    if pending is None:
+        enqueue(refresh_ingredient_nutrition, [ingredient_id])
+    else:
+        pending.add(ingredient_id)
@@ -0,0 +1,102 @@
+"""Рекомендации рецептов по совместному добавлению в избранное.
+
+Команда build_recommendations строит разреженную матрицу
+пользователь × рецепт, считает косинусное сходство рецептов (X.T @ X)
+и сохраняет для каждого рецепта top-K похожих в RecipeNeighbor.
+При запросе сходства соседей избранного пользователя суммируются.
+NumPy и SciPy нужны только для построения и импортируются внутри.
+"""
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import FavoriteRecipe, Recipe, RecipeNeighbor
+
+DEFAULT_TOP_K = 20
+WRITE_BATCH_SIZE = 5000
+
+
+def compute_neighbors(user_ids, recipe_ids, top_k=DEFAULT_TOP_K):
+    """Top-K похожих рецептов по парам (пользователь, рецепт).
+    Возвращает массивы (рецепт, похожий рецепт, сходство).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    recipes, recipe_index = np.unique(recipe_ids, return_inverse=True)
+    favorites = sparse.csr_matrix(
+        (np.ones(len(user_index), dtype=np.float32),
+         (user_index, recipe_index)),
+        shape=(len(users), len(recipes)),
+    )
+    inverse_norm = sparse.diags(
+        1 / np.sqrt(np.asarray(favorites.sum(axis=0)).ravel()))
+    similarity = (inverse_norm @ (favorites.T @ favorites)
+                  @ inverse_norm).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    sources, neighbors, scores = [], [], []
+    indptr, indices, data = (similarity.indptr, similarity.indices,
+                             similarity.data)
+    for row in range(similarity.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        row_scores = data[start:end]
+        top = np.arange(end - start)
+        if end - start > top_k:
+            top = np.argpartition(-row_scores, top_k)[:top_k]
+        sources.append(np.full(len(top), row))
+        neighbors.append(indices[start:end][top])
+        scores.append(row_scores[top])
+    if not sources:
+        empty = np.array([], dtype=recipes.dtype)
+        return empty, empty, np.array([], dtype=np.float32)
+    return (recipes[np.concatenate(sources)],
+            recipes[np.concatenate(neighbors)],
+            np.concatenate(scores))
+
+
+def build_neighbors(top_k=DEFAULT_TOP_K):
+    """Перестраивает таблицу RecipeNeighbor, возвращает число строк."""
+    import numpy as np
+
+    rows = FavoriteRecipe.objects.order_by().values_list('user_id',
+                                                         'recipe_id')
+    pairs = np.fromiter(chain.from_iterable(
+        rows.iterator(chunk_size=WRITE_BATCH_SIZE)), dtype=np.int64
+    ).reshape(-1, 2)
+    sources, neighbors, scores = compute_neighbors(pairs[:, 0], pairs[:, 1],
+                                                   top_k)
+    with transaction.atomic():
+        RecipeNeighbor.objects.all().delete()
+        for start in range(0, len(sources), WRITE_BATCH_SIZE):
+            end = start + WRITE_BATCH_SIZE
+            RecipeNeighbor.objects.bulk_create(
+                RecipeNeighbor(recipe_id=recipe_id, neighbor_id=neighbor_id,
+                               score=score)
+                for recipe_id, neighbor_id, score in zip(
+                    sources[start:end].tolist(),
+                    neighbors[start:end].tolist(),
+                    scores[start:end].tolist())
+            )
+    return len(sources)
+
+
+def recommended_recipes(user):
+    """Рецепты, похожие на избранное пользователя, кроме уже добавленных.
+    Если похожих нет, выдаются популярные.
+    """
+    favorites = FavoriteRecipe.objects.filter(user=user).values('recipe_id')
+    queryset = Recipe.objects.filter(
+        similar_to__recipe_id__in=favorites,
+    ).exclude(id__in=favorites).annotate(
+        recommendation=Sum('similar_to__score'),
+    ).order_by('-recommendation', '-pub_date')
+    if queryset.exists():
+        return queryset
+    return Recipe.objects.filter(score__isnull=False).exclude(
+        id__in=favorites).order_by('-score__popular', '-pub_date')
@@ -0,0 +1,133 @@
+"""Рейтинги рецептов: популярность и тренд.
+
+popular — взвешенная сумма добавлений в избранное, список покупок и
+подписчиков автора. trending — та же сумма, но с экспоненциальным
+затуханием: refresh_scores умножает его на 0.5 за каждый период
+полураспада, прошедший с прошлого пересчёта.
+
+Подписка меняет только строку AuthorScore автора; в рейтинги его рецептов
+она попадает при следующем refresh_scores.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from recipes.models import (AuthorScore, FavoriteRecipe, Follow, Recipe,
+                            RecipeScore, ShoppingList)
+
+RECIPE_LIST_WEIGHTS = {
+    'favoriterecipe': 3.0,
+    'shoppinglist': 2.0,
+}
+AUTHOR_LIST_WEIGHTS = {
+    'follow': 1.0,
+}
+REFRESH_BATCH_SIZE = 1000
+
+
+def apply_weight(queryset, weight):
+    queryset.update(
+        popular=Greatest(F('popular') + weight, Value(0.0)),
+        trending=Greatest(F('trending') + weight, Value(0.0)),
+    )
+
+
+def add_author_trending(author_ids, weight):
+    """Одним upsert копит прирост тренда в строках AuthorScore авторов."""
+    quote = connection.ops.quote_name
+    table = quote(AuthorScore._meta.db_table)
+    column = quote('pending_trending')
+    values = ', '.join(['(%s, %s)'] * len(author_ids))
+    params = [value for author_id in author_ids
+              for value in (author_id, weight)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({quote("author_id")}, {column}) '
+            f'VALUES {values} ON CONFLICT ({quote("author_id")}) '
+            f'DO UPDATE SET {column} = {table}.{column} + excluded.{column}',
+            params)
+
+
+def record_list_change(list_model, object_ids, added=True):
+    """Учитывает добавление (или удаление) рецептов в избранное/покупки
+    либо подписку на авторов одним запросом.
+    """
+    if not object_ids:
+        return
+    name = list_model._meta.model_name
+    sign = 1 if added else -1
+    if name in RECIPE_LIST_WEIGHTS:
+        apply_weight(RecipeScore.objects.filter(recipe_id__in=object_ids),
+                     sign * RECIPE_LIST_WEIGHTS[name])
+    elif name in AUTHOR_LIST_WEIGHTS:
+        add_author_trending(object_ids, sign * AUTHOR_LIST_WEIGHTS[name])
+
+
+def count_of(queryset, field, outer_field):
+    """Коррелированный подзапрос с количеством строк."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer_field)}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def refresh_scores(now=None):
+    """Полный пересчёт popular и затухание trending.
+    Возвращает число пересчитанных рецептов.
+    """
+    now = now or timezone.now()
+    RecipeScore.objects.bulk_create(
+        [RecipeScore(recipe_id=recipe_id) for recipe_id in
+         Recipe.objects.filter(score__isnull=True).values_list(
+             'id', flat=True)],
+        ignore_conflicts=True,
+    )
+    last_refresh = RecipeScore.objects.aggregate(
+        last=Max('refreshed_at'))['last']
+    if last_refresh:
+        hours = (now - last_refresh).total_seconds() / 3600
+        factor = 0.5 ** (hours / settings.RECIPE_TRENDING_HALF_LIFE_HOURS)
+        RecipeScore.objects.update(trending=F('trending') * factor)
+    apply_author_trending()
+
+    counts = Recipe.objects.order_by().annotate(
+        favorites=count_of(FavoriteRecipe.objects, 'recipe', 'pk'),
+        carts=count_of(ShoppingList.objects, 'recipe', 'pk'),
+        followers=count_of(Follow.objects, 'author', 'author'),
+    ).values_list('id', 'favorites', 'carts', 'followers')
+    batch = []
+    total = 0
+    for recipe_id, favorites, carts, followers in counts.iterator():
+        batch.append(RecipeScore(
+            recipe_id=recipe_id,
+            popular=(favorites * RECIPE_LIST_WEIGHTS['favoriterecipe']
+                     + carts * RECIPE_LIST_WEIGHTS['shoppinglist']
+                     + followers * AUTHOR_LIST_WEIGHTS['follow']),
+            refreshed_at=now,
+        ))
+        if len(batch) >= REFRESH_BATCH_SIZE:
+            total += write_batch(batch)
+            batch = []
+    total += write_batch(batch)
+    return total
+
+
+def apply_author_trending():
+    """Переносит накопленный прирост тренда авторов в рейтинги их рецептов
+    и обнуляет его; строки авторов заблокированы до конца транзакции.
+    """
+    with transaction.atomic():
+        pending = dict(AuthorScore.objects.select_for_update().exclude(
+            pending_trending=0).values_list('author_id', 'pending_trending'))
+        for author_id, weight in pending.items():
+            RecipeScore.objects.filter(recipe__author_id=author_id).update(
+                trending=Greatest(F('trending') + weight, Value(0.0)))
+        AuthorScore.objects.filter(author_id__in=pending).update(
+            pending_trending=0)
+
+
+def write_batch(batch):
+    RecipeScore.objects.bulk_update(batch, ['popular', 'refreshed_at'])
+    return len(batch)
@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from recipes.changes import (bump_recipe_version, bump_recipe_versions,
+                             record_changes, recipe_deleted,
+                             schedule_ingredient_bump, touched_recipes)
+from recipes.commit_hooks import on_commit_once
+from recipes.models import (DataVersion, Ingredient, IngredientNutrition,
+                            IngredientRecipe, Recipe, RecipeChange,
+                            RecipeNutrition, RecipeScore, Tag)
+from recipes.nutrition import (schedule_ingredient_refresh,
+                               schedule_recipe_refresh)
+from tasks.queue import enqueue
+
+User = get_user_model()
+
+RECIPES_VERSION = 'recipes'
+
+
+def publish_snapshot():
+    enqueue('recipes.snapshots.publish_ingredient_snapshot',
+            key='publish-ingredient-snapshot')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """Переопубликовать снимок каталога после коммита."""
+    on_commit_once(publish_snapshot)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    """Строка рейтинга создаётся вместе с рецептом."""
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_nutrition(sender, instance, created, **kwargs):
+    """Итоги создаются нулевыми; их заполняет refresh_recipe_nutrition
+    после добавления ингредиентов.
+    """
+    if created:
+        RecipeNutrition.objects.create(recipe_id=instance.pk)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_line_changed(sender, instance, **kwargs):
+    schedule_recipe_refresh(instance.recipe_id)
+
+
+@receiver(post_save, sender=IngredientNutrition)
+@receiver(post_delete, sender=IngredientNutrition)
+def ingredient_nutrition_changed(sender, instance, **kwargs):
+    schedule_ingredient_refresh(instance.ingredient_id)
+
+
+def recipes_version():
+    """Версия данных, из которых строится выдача рецептов."""
+    return DataVersion.objects.filter(name=RECIPES_VERSION).values_list(
+        'value', flat=True).first() or 0
+
+
+def bump_recipes_version():
+    versions = DataVersion.objects.filter(name=RECIPES_VERSION)
+    if not versions.update(value=F('value') + 1):
+        DataVersion.objects.get_or_create(name=RECIPES_VERSION)
+        versions.update(value=F('value') + 1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=User)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    """Сменить версию рецептов после коммита."""
+    on_commit_once(bump_recipes_version)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, update_fields=None, **kwargs):
+    """Вход пользователя (обновление last_login) выдачу не меняет."""
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    on_commit_once(bump_recipes_version)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """Новая версия рецепта; на ней же перестаёт совпадать ключ
+    закешированной карточки (api.views.RecipeViewSet.retrieve).
+    """
+    if created:
+        touched_recipes().add(instance.pk)
+        record_changes([instance.pk], RecipeChange.UPDATED)
+    else:
+        bump_recipe_version(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    recipe_deleted(instance.pk)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_recipe_version(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_recipe_version(instance.pk)
+    elif action == 'pre_clear':
+        bump_recipe_versions(Recipe.objects.filter(tags=instance))
+    else:
+        bump_recipe_versions(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_recipe_versions(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    """Название и единица ингредиента есть в карточках рецептов;
+    сохранение без их изменения версии рецептов не меняет.
+    """
+    if not created and instance.label_changed:
+        schedule_ingredient_bump(instance.pk)
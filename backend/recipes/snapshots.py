@@ -0,0 +1,101 @@
+"""Снимок каталога ингредиентов в статике.
+
+Каталог почти не меняется, поэтому он публикуется в STATIC_ROOT
+как версионированный JSON (и его gzip-копия для nginx gzip_static).
+Версия — хеш содержимого, поэтому файлы можно кешировать навсегда.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+SNAPSHOT_DIR = 'ingredients'
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_FIELDS = ('id', 'name', 'measurement_unit')
+KEEP_SNAPSHOTS = 2
+
+_manifest_cache = {}
+_data_cache = {}
+
+
+def snapshot_path(name=''):
+    return os.path.join(settings.STATIC_ROOT, SNAPSHOT_DIR, name)
+
+
+def write_file(path, content):
+    """Атомарная запись: читатели не увидят недописанный файл."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def publish_ingredient_snapshot():
+    """Публикует текущий каталог и возвращает манифест."""
+    data = list(Ingredient.objects.values(*SNAPSHOT_FIELDS))
+    body = json.dumps(data, ensure_ascii=False,
+                      separators=(',', ':')).encode()
+    version = hashlib.sha256(body).hexdigest()[:16]
+    filename = f'ingredients.{version}.json'
+    os.makedirs(snapshot_path(), exist_ok=True)
+    write_file(snapshot_path(filename), body)
+    write_file(snapshot_path(f'{filename}.gz'),
+               gzip.compress(body, compresslevel=9))
+    manifest = {
+        'version': version,
+        'url': f'{settings.STATIC_URL}{SNAPSHOT_DIR}/{filename}',
+        'count': len(data),
+    }
+    previous = read_manifest()
+    write_file(snapshot_path(MANIFEST_NAME),
+               json.dumps(manifest).encode())
+    keep = {filename}
+    if previous:
+        keep.add(previous['url'].rsplit('/', 1)[-1])
+    remove_old_snapshots(keep)
+    return manifest
+
+
+def remove_old_snapshots(keep):
+    for name in os.listdir(snapshot_path()):
+        base_name = name[:-len('.gz')] if name.endswith('.gz') else name
+        if (name.startswith('ingredients.') and base_name.endswith('.json')
+                and base_name not in keep):
+            os.remove(snapshot_path(name))
+
+
+def read_manifest():
+    """Манифест текущего снимка или None, если он не опубликован.
+    Перечитывается только при изменении файла.
+    """
+    path = snapshot_path(MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if _manifest_cache.get('mtime') != mtime:
+        with open(path, 'rb') as file:
+            _manifest_cache.update(mtime=mtime, manifest=json.load(file))
+    return _manifest_cache['manifest']
+
+
+def get_snapshot_data():
+    """Содержимое текущего снимка или None."""
+    manifest = read_manifest()
+    if manifest is None:
+        return None
+    version = manifest['version']
+    if version not in _data_cache:
+        filename = manifest['url'].rsplit('/', 1)[-1]
+        try:
+            with open(snapshot_path(filename), 'rb') as file:
+                data = json.load(file)
+        except OSError:
+            return None
+        _data_cache.clear()
+        _data_cache[version] = data
+    return _data_cache[version]
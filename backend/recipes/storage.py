@@ -0,0 +1,116 @@
+"""Хранилища медиа с именами по содержимому.
+
+Файл сохраняется под именем <каталог>/<2 символа>/<sha256><расширение>,
+поэтому одна и та же картинка, загруженная дважды, хранится один раз.
+Хеш считается по content.chunks(), запись тоже идёт кусками, так что
+файл целиком в памяти не держится. Файлы общие, поэтому при удалении
+или смене картинки рецепта они не удаляются — неиспользуемые убирает
+команда gc_media. Повторная загрузка существующего файла обновляет
+его время изменения: gc_media не удалит файл в пределах grace-периода,
+даже если раньше на него никто не ссылался.
+
+Хранилище выбирается настройкой MEDIA_STORAGE: filesystem (MEDIA_ROOT)
+или s3 — S3-совместимое хранилище, например MinIO
+(infra/docker-compose.minio.yml). django-storages и boto3 для s3 есть
+в requirements.txt, чтобы один образ работал в обоих режимах, но
+импортируются только при обращении к S3ContentHashStorage.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def content_hash(content):
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ContentHashMixin:
+    """Имя файла — хеш содержимого; если такой файл уже есть,
+    повторно он не записывается, а только обновляется время изменения
+    (touch).
+    """
+
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            try:
+                self.touch(name)
+                return name
+            except FileNotFoundError:
+                # Удалён gc_media между проверкой и touch.
+                pass
+        return self._save(name, content)
+
+    def touch(self, name):
+        """Обновляет время изменения файла name, чтобы gc_media не удалил
+        его как старый. По умолчанию ничего не делает: хранилище без
+        touch просто не продлевает файл при повторной загрузке.
+        """
+
+
+class ContentHashStorage(ContentHashMixin, FileSystemStorage):
+
+    def touch(self, name):
+        os.utime(self.path(name))
+
+
+def s3_content_hash_storage():
+    from botocore.exceptions import ClientError
+    from storages.backends.s3boto3 import S3Boto3Storage
+
+    class S3ContentHashStorage(ContentHashMixin, S3Boto3Storage):
+
+        def touch(self, name):
+            """Копирование объекта в себя обновляет LastModified."""
+            obj = self.bucket.Object(self._normalize_name(
+                self._clean_name(name)))
+            try:
+                obj.copy_from(
+                    CopySource={'Bucket': obj.bucket_name, 'Key': obj.key},
+                    MetadataDirective='REPLACE',
+                    ContentType=obj.content_type,
+                    CacheControl=obj.cache_control or '',
+                    Metadata=obj.metadata,
+                )
+            except ClientError as error:
+                if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                    raise FileNotFoundError(name) from error
+                raise
+
+    S3ContentHashStorage.__module__ = __name__
+    return S3ContentHashStorage
+
+
+def __getattr__(name):
+    """S3ContentHashStorage создаётся при первом обращении, чтобы без
+    MEDIA_STORAGE=s3 не импортировать boto3.
+    """
+    if name == 'S3ContentHashStorage':
+        globals()[name] = s3_content_hash_storage()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def walk_files(storage, path):
+    """Все файлы хранилища под path (listdir работает и для S3)."""
+    directories, files = storage.listdir(path)
+    for filename in files:
+        yield posixpath.join(path, filename)
+    for directory in directories:
+        yield from walk_files(storage, posixpath.join(path, directory))
@@ -0,0 +1,20 @@
+"""Приведение единиц измерения ингредиентов к базовым.
+
+Таблица покрывает единицы из data/ingredients.csv, которые переводятся
+друг в друга без плотности продукта: масса — в граммы, объём —
+в миллилитры. Остальные единицы (шт., по вкусу, щепотка...) остаются
+как есть с множителем 1.
+"""
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 200),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+}
+
+
+def normalize_unit(measurement_unit):
+    """Базовая единица и множитель для единицы измерения."""
+    unit = measurement_unit.strip()
+    return UNIT_CONVERSIONS.get(unit, (unit, 1))
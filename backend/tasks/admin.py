@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from tasks.models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Админ-зона фоновых задач.
+    """
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after',
+                    'finished_at')
+    list_filter = ('status',)
+    search_fields = ('name', 'idempotency_key')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.models import Task
+from tasks.queue import (claim_task, execute_task, get_backend, queue_stats,
+                         requeue_stale)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в БД (TASKS_BACKEND=database).'
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Пауза при пустой очереди, с')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Через сколько секунд running-задача '
+                                 'считается зависшей')
+        parser.add_argument('--stats', action='store_true',
+                            help='Показать глубину очереди и выйти')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = get_backend('database').stats()
+            for status, _ in Task.STATUS_CHOICES:
+                self.stdout.write(f'{status}: {stats.get(status, 0)}')
+            return
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+        processed = 0
+        try:
+            while True:
+                task = claim_task()
+                if task is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                task = execute_task(task)
+                processed += 1
+                self.stdout.write(
+                    f'{task.name} (id={task.id}): {task.status}')
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {processed}, очередь: {queue_stats()}'))
@@ -0,0 +1,263 @@
+"""Очередь фоновых задач без внешнего брокера.
+
+Бэкенд выбирается настройкой TASKS_BACKEND:
+    immediate — задача выполняется сразу в текущем потоке;
+    local     — пул потоков внутри процесса (TASKS_LOCAL_WORKERS);
+    database  — строка в таблице Task, её выполняет команда run_worker.
+
+Задача — любая функция уровня модуля, она передаётся объектом или
+строкой 'module.function'. Аргументы должны сериализоваться в JSON.
+"""
+import logging
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def task_name(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def retry_delay(attempt):
+    """Экспоненциальная задержка перед повторной попыткой, в секундах."""
+    return settings.TASKS_RETRY_DELAY * 2 ** (attempt - 1)
+
+
+def run_task(name, args, kwargs):
+    return import_string(name)(*args, **kwargs)
+
+
+def run_with_retries(name, args, kwargs, max_attempts):
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return run_task(name, args, kwargs)
+        except Exception:
+            logger.exception('Задача %s: попытка %s из %s не удалась',
+                             name, attempt, max_attempts)
+            if attempt == max_attempts:
+                raise
+            time.sleep(retry_delay(attempt))
+
+
+class ImmediateBackend:
+    """Выполняет задачу сразу, удобно для отладки и management-команд."""
+
+    def enqueue(self, name, args, kwargs, key, max_attempts):
+        run_with_retries(name, args, kwargs, max_attempts)
+
+    def stats(self):
+        return {}
+
+
+class LocalBackend:
+    """Пул потоков в текущем процессе.
+    Пока задача с ключом идемпотентности ждёт в очереди, повтор не
+    ставится. Повтор для уже выполняющейся задачи откладывается и
+    запускается после неё: изменения, сделанные во время её работы,
+    не теряются, а задачи с одним ключом не идут параллельно.
+    Задачи без ключа не дедуплицируются и не откладываются.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.TASKS_LOCAL_WORKERS,
+            thread_name_prefix='tasks',
+        )
+        self.lock = threading.Lock()
+        self.pending_keys = set()
+        self.running_keys = set()
+        self.deferred = {}
+        self.queued = 0
+
+    def enqueue(self, name, args, kwargs, key, max_attempts):
+        task = (name, args, kwargs, key, max_attempts)
+        with self.lock:
+            if key is not None:
+                if key in self.pending_keys:
+                    return
+                self.pending_keys.add(key)
+            self.queued += 1
+            if key is not None and key in self.running_keys:
+                self.deferred.setdefault(key, deque()).append(task)
+                return
+        self.executor.submit(self.run, *task)
+
+    def run(self, name, args, kwargs, key, max_attempts):
+        if key is not None:
+            with self.lock:
+                self.pending_keys.discard(key)
+                self.running_keys.add(key)
+        try:
+            run_with_retries(name, args, kwargs, max_attempts)
+        except Exception:
+            pass
+        finally:
+            connections.close_all()
+            deferred = None
+            with self.lock:
+                self.queued -= 1
+                if key is not None:
+                    self.running_keys.discard(key)
+                    waiting = self.deferred.get(key)
+                    if waiting:
+                        deferred = waiting.popleft()
+                        if not waiting:
+                            del self.deferred[key]
+            if deferred is not None:
+                self.executor.submit(self.run, *deferred)
+
+    def stats(self):
+        return {'local': self.queued}
+
+
+class DatabaseBackend:
+    """Задачи хранятся в таблице Task и выполняются командой run_worker."""
+
+    def enqueue(self, name, args, kwargs, key, max_attempts):
+        try:
+            with transaction.atomic():
+                return Task.objects.create(
+                    name=name,
+                    args=list(args),
+                    kwargs=kwargs,
+                    idempotency_key=key,
+                    max_attempts=max_attempts,
+                )
+        except IntegrityError:
+            if key is None:
+                raise
+            return Task.objects.filter(
+                idempotency_key=key,
+                status=Task.PENDING,
+            ).first()
+
+    def stats(self):
+        return dict(
+            Task.objects.order_by().values_list('status').annotate(
+                count=Count('id'))
+        )
+
+
+BACKENDS = {
+    'immediate': ImmediateBackend,
+    'local': LocalBackend,
+    'database': DatabaseBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    name = name or settings.TASKS_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+
+def enqueue(func, *args, key=None, max_attempts=None, **kwargs):
+    """Поставить задачу в очередь.
+    key — ключ идемпотентности: пока такая задача ждёт выполнения,
+    повторная постановка игнорируется. Повтор уже выполняющейся задачи
+    ставится и выполняется после неё.
+    """
+    return get_backend().enqueue(
+        task_name(func), args, kwargs, key,
+        max_attempts or settings.TASKS_MAX_ATTEMPTS,
+    )
+
+
+def queue_stats():
+    """Глубина очереди по статусам для текущего бэкенда."""
+    return get_backend().stats()
+
+
+def claim_task():
+    """Забирает одну готовую задачу; параллельные воркеры не мешают
+    друг другу благодаря SELECT ... FOR UPDATE SKIP LOCKED. Задача,
+    ключ которой ещё выполняется, ждёт завершения предыдущей.
+    """
+    running = Task.objects.filter(
+        status=Task.RUNNING,
+        idempotency_key=OuterRef('idempotency_key'),
+    )
+    with transaction.atomic():
+        task = Task.objects.select_for_update(skip_locked=True).filter(
+            status=Task.PENDING,
+            run_after__lte=timezone.now(),
+        ).exclude(Exists(running)).order_by('run_after', 'id').first()
+        if task is None:
+            return None
+        task.status = Task.RUNNING
+        task.attempts += 1
+        task.started_at = timezone.now()
+        task.save(update_fields=['status', 'attempts', 'started_at'])
+    return task
+
+
+def execute_task(task):
+    try:
+        run_task(task.name, task.args, task.kwargs)
+    except Exception:
+        task.last_error = traceback.format_exc()
+        logger.exception('Задача %s (id=%s) не выполнена',
+                         task.name, task.id)
+        if task.attempts < task.max_attempts and requeue(
+                task, timezone.now() + timedelta(
+                    seconds=retry_delay(task.attempts))):
+            return task
+        task.status = Task.FAILED
+    else:
+        task.status = Task.DONE
+    task.finished_at = timezone.now()
+    task.save(update_fields=['status', 'finished_at', 'last_error'])
+    return task
+
+
+def requeue(task, run_after):
+    """Возвращает задачу в pending. False, если пока она выполнялась,
+    с тем же ключом поставили новую: повтор не нужен, новая задача
+    сделает ту же работу на свежих данных.
+    """
+    task.status = Task.PENDING
+    task.run_after = run_after
+    try:
+        with transaction.atomic():
+            task.save(update_fields=['status', 'run_after', 'last_error'])
+    except IntegrityError:
+        task.status = Task.RUNNING
+        return False
+    return True
+
+
+def requeue_stale(timeout):
+    """Возвращает в очередь задачи, зависшие в running (упавший воркер).
+    Если с тем же ключом уже ждёт другая задача, зависшая закрывается.
+    """
+    requeued = 0
+    for task in Task.objects.filter(
+            status=Task.RUNNING,
+            started_at__lt=timezone.now() - timedelta(seconds=timeout)):
+        if requeue(task, task.run_after):
+            requeued += 1
+        else:
+            task.status = Task.FAILED
+            task.finished_at = timezone.now()
+            task.save(update_fields=['status', 'finished_at'])
+    return requeued
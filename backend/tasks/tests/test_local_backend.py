@@ -0,0 +1,55 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from tasks.queue import LocalBackend, task_name
+
+started = threading.Event()
+release = threading.Event()
+calls = []
+calls_lock = threading.Lock()
+
+
+def block(label):
+    with calls_lock:
+        calls.append(label)
+    started.set()
+    release.wait(5)
+
+
+def record(label):
+    with calls_lock:
+        calls.append(label)
+
+
+@override_settings(TASKS_LOCAL_WORKERS=4)
+class LocalBackendTest(SimpleTestCase):
+    """Задачи, поставленные во время выполнения другой, не теряются."""
+
+    def setUp(self):
+        calls.clear()
+        started.clear()
+        release.clear()
+        self.backend = LocalBackend()
+        self.addCleanup(self.backend.executor.shutdown)
+
+    def run_while_blocked(self, key, labels):
+        self.backend.enqueue(task_name(block), ('A',), {}, key, 1)
+        self.assertTrue(started.wait(5))
+        for label in labels:
+            self.backend.enqueue(task_name(record), (label,), {}, key, 1)
+        release.set()
+        deadline = time.monotonic() + 5
+        while self.backend.stats()['local'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.backend.stats(), {'local': 0})
+
+    def test_keyless_tasks(self):
+        self.run_while_blocked(None, ['B', 'C', 'D'])
+        self.assertEqual(sorted(calls), ['A', 'B', 'C', 'D'])
+
+    def test_same_key_runs_once_after_running_task(self):
+        self.run_while_blocked('key', ['B', 'C', 'D'])
+        self.assertEqual(calls, ['A', 'B'])
+        self.assertEqual(self.backend.deferred, {})
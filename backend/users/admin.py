@@ -9,7 +9,8 @@ class UserAdmin(admin.ModelAdmin):
     """
     list_display = ('id', 'username', 'first_name', 'last_name', 'email')
     search_fields = ('email', 'username')
-    list_filter = ('email', 'username')
+    list_filter = ('is_staff', 'is_active')
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
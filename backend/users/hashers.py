@@ -0,0 +1,148 @@
+"""Хеширование паролей в отдельном пуле процессов.
+
+Хеш пароля считается сотни миллисекунд CPU. Чтобы всплеск регистраций
+и входов не занимал все ядра воркеров API, encode/verify выполняются
+в пуле процессов. Пул создаётся в каждом воркере gunicorn при первом
+использовании (уже после форка) в режиме spawn, поэтому общее число
+хешей ограничивается не им, а слотами на хост: перед хешированием
+запрос занимает один из PASSWORD_HASHING_WORKERS файлов-слотов
+(flock в PASSWORD_HASHING_LOCK_DIR) и ждёт, если все заняты. Так
+одновременно хешированием заняты не больше PASSWORD_HASHING_WORKERS
+ядер и PASSWORD_HASHING_WORKERS * ARGON2_MEMORY_COST КиБ памяти на
+весь хост. Блокировку flock снимает ядро, даже если процесс упал.
+При PASSWORD_HASHING_WORKERS = 0 хеш считается в текущем процессе
+без ограничений.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_pool_process = False
+
+SLOT_WAIT_DELAY = 0.01
+
+
+def mark_pool_process():
+    """Инициализатор процесса пула: verify некоторых хешеров вызывает
+    encode, и внутри пула он должен выполняться на месте.
+    """
+    global _in_pool_process
+    _in_pool_process = True
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=mark_pool_process,
+            )
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+@contextmanager
+def host_slot():
+    """Один из PASSWORD_HASHING_WORKERS слотов хоста; ждёт свободного.
+    Без fcntl (не Unix) ограничение только внутри процесса.
+    """
+    if fcntl is None:
+        yield
+        return
+    slots = settings.PASSWORD_HASHING_WORKERS
+    os.makedirs(settings.PASSWORD_HASHING_LOCK_DIR, exist_ok=True)
+    while True:
+        for slot in range(slots):
+            path = os.path.join(settings.PASSWORD_HASHING_LOCK_DIR,
+                                f'foodgram-password-hashing.{slot}.lock')
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                yield
+            finally:
+                os.close(fd)
+            return
+        time.sleep(SLOT_WAIT_DELAY)
+
+
+def run_in_pool(func, *args):
+    """Выполняет func в пуле, заняв слот хоста; если пул отключён —
+    на месте, если упал — на месте в том же слоте.
+    """
+    if _in_pool_process or not settings.PASSWORD_HASHING_WORKERS:
+        return func(*args)
+    with host_slot():
+        try:
+            return get_pool().submit(func, *args).result()
+        except BrokenProcessPool:
+            reset_pool()
+            return func(*args)
+
+
+class PooledHasherMixin:
+    """Переносит encode и verify хешера в пул процессов.
+    В процесс пула передаётся сам хешер вместе с параметрами,
+    поэтому настройки Django там не нужны.
+    """
+
+    def encode(self, password, salt, *args):
+        return run_in_pool(self.local_encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        return run_in_pool(self.local_verify, password, encoded)
+
+    def local_encode(self, password, salt, *args):
+        return super().encode(password, salt, *args)
+
+    def local_verify(self, password, encoded):
+        return super().verify(password, encoded)
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    """Argon2 с параметрами из настроек (ARGON2_*)."""
+
+    def __init__(self):
+        self.time_cost = settings.ARGON2_TIME_COST
+        self.memory_cost = settings.ARGON2_MEMORY_COST
+        self.parallelism = settings.ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(PooledHasherMixin,
+                                 hashers.BCryptSHA256PasswordHasher):
+    """bcrypt, число раундов из BCRYPT_ROUNDS. Нужен пакет bcrypt."""
+
+    def __init__(self):
+        self.rounds = settings.BCRYPT_ROUNDS
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    """Стандартный хешер Django; нужен для проверки старых паролей,
+    при входе они перехешируются основным алгоритмом.
+    """
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+INDEXES = {
+    'users_customuser_username_upper_idx': 'username',
+    'users_customuser_email_upper_idx': 'email',
+}
+
+
+def create_indexes(apps, schema_editor):
+    """Индексы для поиска по началу логина и email без учёта регистра
+    (istartswith: UPPER(field::text) LIKE 'X%'). Только для PostgreSQL.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, field in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users_customuser '
+            f'(UPPER({field}::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]